@@ -0,0 +1,317 @@
+import json
+import multiprocessing
+from collections import OrderedDict, deque
+
+import degrees
+import snapshot
+from graph import CSRGraph
+
+# Per-worker view of the snapshot arrays, set up by _attach
+_worker_graph = None
+_worker_components = None
+
+
+class BFSTree():
+    """
+    Breadth-first search tree grown from a single source on demand.
+
+    path_to only expands the tree until the target has been discovered,
+    and the next call resumes from where the previous one stopped, so
+    many queries sharing a source pay for one traversal between them.
+    Works on whatever ids movies_of and stars_of use.
+    """
+
+    def __init__(self, source, movies_of, stars_of):
+        self.movies_of = movies_of
+        self.stars_of = stars_of
+        self.parents = {source: None}  # person -> (movie, parent person)
+        self.frontier = deque([source])
+        self.explored_movies = set()
+
+    def path_to(self, target):
+        """
+        Returns the (movie, person) path from the source to target,
+        or None if target is not reachable.
+        """
+        parents = self.parents
+        while target not in parents and self.frontier:
+            person = self.frontier.popleft()
+            for movie in self.movies_of(person):
+                if movie in self.explored_movies:
+                    continue
+                self.explored_movies.add(movie)
+                for star in self.stars_of(movie):
+                    if star not in parents:
+                        parents[star] = (movie, person)
+                        self.frontier.append(star)
+
+        if target not in parents:
+            return None
+        path = []
+        while parents[target] is not None:
+            movie, parent = parents[target]
+            path.append((movie, target))
+            target = parent
+        path.reverse()
+        return path
+
+
+class QueryEngine():
+    """
+    Answers many shortest-path queries against the data loaded in degrees,
+    keeping a bounded LRU cache of recent results.
+    """
+
+    def __init__(self, cache_size=1024):
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def query(self, source, target):
+        """
+        Returns the shortest (movie_id, person_id) path, as in
+        degrees.shortest_path, answering from the cache when possible.
+        """
+        path = self.lookup(source, target)
+        if path is not None:
+            return path[0]
+        path = degrees.shortest_path(source, target)
+        self.store(source, target, path)
+        return path
+
+    def batch(self, pairs):
+        """
+        Yields the shortest path for every (source, target) pair, in order.
+
+        Sources that appear in more than one uncached pair share a BFSTree
+        instead of running a fresh search for each target.
+        """
+        pairs = list(pairs)
+        planned = [not self.peek(source, target) for source, target in pairs]
+        counts = {}
+        for (source, _), uncached in zip(pairs, planned):
+            if uncached:
+                counts[source] = counts.get(source, 0) + 1
+
+        trees = {}
+        for (source, target), uncached in zip(pairs, planned):
+            cached = self.lookup(source, target)
+            if cached is not None:
+                path = cached[0]
+            else:
+                if not degrees.connected(source, target):
+                    path = None
+                elif source in trees or counts.get(source, 0) > 1:
+                    if source not in trees:
+                        trees[source] = _tree(source)
+                    path = _tree_path(trees[source], target)
+                else:
+                    path = degrees.shortest_path(source, target)
+                self.store(source, target, path)
+            if uncached:
+                counts[source] -= 1
+                if counts[source] == 0:
+                    trees.pop(source, None)  # Its last query is done
+            yield path
+
+    def parallel_batch(self, pairs, directory, workers=None, chunksize=64):
+        """
+        Same as batch, but uncached pairs are sharded across a pool of
+        worker processes. Results are yielded in input order as they
+        stream back.
+
+        Needs the compact backend loaded from directory with its snapshot
+        in place: each worker memory-maps the snapshot arrays, so all of
+        them share one copy of the graph in the page cache instead of
+        unpickling their own. Searches run on person numbers and only
+        this process translates them back to ids.
+        """
+        graph = degrees.graph
+        if graph is None or not snapshot.usable(directory):
+            raise ValueError("parallel batches need the compact backend and its snapshot")
+
+        # Every pair is planned as ("cached", path) when the cache answers
+        # it now, so later evictions cannot send it back to a search here,
+        # ("repeat", None) when it appeared earlier in this batch either way
+        # round, ("disconnected", None) or ("search", None)
+        pairs = list(pairs)
+        plan = []
+        jobs = []
+        planned = set()
+        for source, target in pairs:
+            if (source, target) in planned or (target, source) in planned:
+                self.hits += 1
+                plan.append(("repeat", None))
+                continue
+            cached = self.lookup(source, target)
+            if cached is not None:
+                plan.append(("cached", cached[0]))
+                continue
+            planned.add((source, target))
+            if not degrees.connected(source, target):
+                plan.append(("disconnected", None))
+            else:
+                plan.append(("search", None))
+                jobs.append((graph.person_index[source], graph.person_index[target]))
+
+        # Paths found by this batch, which answer its repeated pairs
+        found = {}
+        with multiprocessing.Pool(workers, initializer=_attach,
+                                  initargs=(directory,)) as pool:
+            results = pool.imap(_solve, jobs, chunksize)
+            for (source, target), (kind, path) in zip(pairs, plan):
+                if kind == "repeat":
+                    if (source, target) in found:
+                        path = found[(source, target)]
+                    else:
+                        path = reverse_path(target, found[(target, source)])
+                elif kind != "cached":
+                    if kind == "search":
+                        path = next(results)
+                    if path is not None:
+                        path = [(graph.movie_ids[movie], graph.person_ids[person])
+                                for movie, person in path]
+                    found[(source, target)] = path
+                    self.store(source, target, path)
+                yield path
+
+    def peek(self, source, target):
+        """
+        Returns whether a pair is cached, without touching the counters.
+        """
+        return (source, target) in self.cache or (target, source) in self.cache
+
+    def lookup(self, source, target):
+        """
+        Returns (path,) if the pair or its reverse is cached, else None.
+        """
+        if (source, target) in self.cache:
+            self.cache.move_to_end((source, target))
+            self.hits += 1
+            return (self.cache[(source, target)],)
+        if (target, source) in self.cache:
+            self.cache.move_to_end((target, source))
+            self.hits += 1
+            return (reverse_path(target, self.cache[(target, source)]),)
+        self.misses += 1
+        return None
+
+    def store(self, source, target, path):
+        self.cache[(source, target)] = path
+        self.cache.move_to_end((source, target))
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "cached": len(self.cache)}
+
+
+def reverse_path(source, path):
+    """
+    Turns the path from source to its last person into
+    the path from that person back to source.
+    """
+    if path is None:
+        return None
+    people = [source] + [person_id for _, person_id in path]
+    return [(path[i][0], people[i]) for i in range(len(path) - 1, -1, -1)]
+
+
+def _tree(source):
+    """
+    Returns a BFSTree for source over whichever backend degrees loaded.
+    """
+    graph = degrees.graph
+    if graph is None:
+        return BFSTree(source, degrees.movies_for_person, degrees.stars_for_movie)
+    return BFSTree(graph.person_index[source], graph.movies_of, graph.stars_of)
+
+
+def _tree_path(tree, target):
+    """
+    Asks tree for the path to target, translating CSR integer ids if needed.
+    """
+    graph = degrees.graph
+    if graph is None:
+        return tree.path_to(target)
+    path = tree.path_to(graph.person_index[target])
+    if path is None:
+        return None
+    return [(graph.movie_ids[movie], graph.person_ids[person]) for movie, person in path]
+
+
+def _attach(directory):
+    """
+    Pool initializer: maps the snapshot arrays into this worker.
+    """
+    global _worker_graph, _worker_components
+    arrays, _, _ = snapshot.load_arrays(directory)
+    _worker_graph = CSRGraph([], [], *arrays[:4])
+    _worker_components = arrays[4]
+
+
+def _solve(job):
+    """
+    Runs one search in a worker, on person numbers.
+    """
+    source, target = job
+    if _worker_components[source] != _worker_components[target]:
+        return None
+    return degrees.bidirectional_path(source, target,
+                                      _worker_graph.movies_of, _worker_graph.stars_of)
+
+
+def resolve(person):
+    """
+    Returns the person_id for an IMDb id or an unambiguous name, else None.
+    """
+    if person in degrees.people:
+        return person
+    person_ids = degrees.names.get(person.lower(), set())
+    if len(person_ids) == 1:
+        return next(iter(person_ids))
+    return None
+
+
+def run(lines, output, engine=None, directory=None, workers=1):
+    """
+    Reads one "source<TAB>target" pair per line and writes one JSON object
+    per pair to output. Each person may be an IMDb id or a unique name.
+    With more than one worker the searches run in a process pool over the
+    snapshot of directory (see QueryEngine.parallel_batch).
+    Returns the engine used so callers can report its counters.
+    """
+    if engine is None:
+        engine = QueryEngine()
+
+    queries = []
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line.strip():
+            continue
+        fields = line.split("\t")
+        if len(fields) != 2:
+            queries.append((line, None, None))
+            continue
+        queries.append((line, resolve(fields[0].strip()), resolve(fields[1].strip())))
+
+    valid = [(source, target) for _, source, target in queries
+             if source is not None and target is not None]
+    if workers > 1:
+        paths = engine.parallel_batch(valid, directory, workers)
+    else:
+        paths = engine.batch(valid)
+    for line, source, target in queries:
+        if source is None or target is None:
+            record = {"query": line, "error": "person not found"}
+        else:
+            path = next(paths)
+            record = {
+                "source": source,
+                "target": target,
+                "degrees": None if path is None else len(path),
+                "path": path
+            }
+        output.write(json.dumps(record) + "\n")
+    return engine
@@ -0,0 +1,189 @@
+"""
+Benchmarks load_data and shortest_path on synthetic datasets.
+
+Usage: python benchmark.py [--scales 10000 100000 ...] [--output FILE]
+
+For every scale (number of star rows) a dataset is generated in a
+temporary directory, with power-law cast sizes and a power-law number of
+movies per person, the way real casts are skewed. Each backend is then
+timed on loading, single queries and a batch of queries, and the peak
+memory of loading is recorded. Results are written as JSON so runs from
+different versions can be compared.
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import batch
+import degrees
+
+
+def generate(directory, edges, seed=0):
+    """
+    Writes people.csv, movies.csv and stars.csv with about edges star rows.
+    Returns (people, movies, stars) row counts.
+    """
+    rng = random.Random(seed)
+    people_count = max(2, edges // 3)
+
+    # A few people star in many movies, most in one or two
+    weights = [rng.paretovariate(1.2) for _ in range(people_count)]
+    cumulative = []
+    total = 0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+
+    casts = []
+    stars = 0
+    while stars < edges:
+        size = min(int(rng.paretovariate(1.3)) + 1, 250, edges - stars)
+        cast = set(rng.choices(range(people_count), cum_weights=cumulative, k=size))
+        casts.append(cast)
+        stars += len(cast)
+
+    with open(os.path.join(directory, "people.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for person in range(people_count):
+            writer.writerow([person, f"Person {person}", 1900 + person % 120])
+
+    with open(os.path.join(directory, "movies.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for movie in range(len(casts)):
+            writer.writerow([movie, f"Movie {movie}", 1900 + movie % 120])
+
+    with open(os.path.join(directory, "stars.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for movie, cast in enumerate(casts):
+            for person in cast:
+                writer.writerow([person, movie])
+
+    return people_count, len(casts), stars
+
+
+def reset():
+    """
+    Forgets everything degrees has loaded.
+    """
+    degrees.names.clear()
+    degrees.people.clear()
+    degrees.movies.clear()
+    degrees.graph = None
+    degrees.oracle = None
+    degrees.name_index = None
+    degrees.components = {}
+    degrees.component_sizes = []
+
+
+def timed_load(directory, compact):
+    """
+    Loads the dataset and returns the seconds it took.
+    """
+    reset()
+    start = time.perf_counter()
+    degrees.load_data(directory, compact=compact)
+    return time.perf_counter() - start
+
+
+def measure(directory, compact, queries, seed=0):
+    """
+    Returns the timings and peak memory for one backend on one dataset.
+    """
+    result = {"backend": "compact" if compact else "dict"}
+
+    # Peak memory of a load, traced separately since tracing slows it down
+    if compact:
+        snapshot_path = os.path.join(directory, "degrees.snapshot")
+        if os.path.exists(snapshot_path):
+            os.remove(snapshot_path)
+    reset()
+    tracemalloc.start()
+    degrees.load_data(directory, compact=compact, cache=False)
+    result["load_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    result["load_seconds"] = timed_load(directory, compact)
+    if compact:
+        result["snapshot_load_seconds"] = timed_load(directory, compact)
+
+    rng = random.Random(seed)
+    person_ids = list(degrees.people)
+    pairs = [(rng.choice(person_ids), rng.choice(person_ids)) for _ in range(queries)]
+
+    times = []
+    for source, target in pairs:
+        start = time.perf_counter()
+        degrees.shortest_path(source, target)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    result["query_ms_mean"] = 1000 * statistics.mean(times)
+    result["query_ms_p95"] = 1000 * times[int(0.95 * (len(times) - 1))]
+
+    # Batches usually ask many targets for a handful of sources
+    sources = person_ids[:max(1, queries // 20)]
+    batch_pairs = [(rng.choice(sources), rng.choice(person_ids)) for _ in range(queries)]
+    engine = batch.QueryEngine()
+    start = time.perf_counter()
+    for _ in engine.batch(batch_pairs):
+        pass
+    result["batch_seconds"] = time.perf_counter() - start
+    result["batch_queries"] = queries
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(usage="python benchmark.py [options]")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10000, 100000],
+                        help="star rows per generated dataset")
+    parser.add_argument("--queries", type=int, default=200,
+                        help="random queries timed per dataset and backend")
+    parser.add_argument("--backends", nargs="+", default=["dict", "compact"],
+                        choices=["dict", "compact"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json")
+    args = parser.parse_args()
+
+    results = []
+    for edges in args.scales:
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            people_count, movie_count, stars = generate(directory, edges, args.seed)
+            print(f"{stars} stars, {people_count} people, {movie_count} movies "
+                  f"(generated in {time.perf_counter() - start:.1f}s)")
+            for backend in args.backends:
+                result = measure(directory, backend == "compact", args.queries, args.seed)
+                result.update(edges=stars, people=people_count, movies=movie_count)
+                results.append(result)
+                snapshot = ""
+                if "snapshot_load_seconds" in result:
+                    snapshot = f" ({result['snapshot_load_seconds']:.2f}s from snapshot)"
+                print(f"    {backend:8} load {result['load_seconds']:.2f}s{snapshot}, "
+                      f"peak {result['load_peak_bytes'] / 2 ** 20:.1f} MiB, "
+                      f"query {result['query_ms_mean']:.2f} ms "
+                      f"(p95 {result['query_ms_p95']:.2f} ms), "
+                      f"batch {result['batch_seconds']:.2f}s")
+    reset()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results
+        }, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,14 @@
+import argparse
 import csv
 import sys
+from array import array
+from collections import deque
 
-from util import Node, StackFrontier, QueueFrontier
+import snapshot
+from graph import CSRGraph
+from landmarks import LandmarkOracle
+from nameindex import NameIndex
+from util import Node, StackFrontier, QueueFrontier, PriorityFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -12,11 +19,43 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Integer-indexed CSR graph of people and movies, when loaded with compact=True
+graph = None
 
-def load_data(directory):
+# Maps each person (person_id, or person number with the CSR graph)
+# to the id of its connected component, and component ids to their sizes
+components = {}
+component_sizes = []
+
+# Landmark distances used for A* search, once load_landmarks has run
+oracle = None
+
+# Prefix and typo-tolerant lookup over names, built on first use
+name_index = None
+
+# Counters from the most recent bidirectional search
+search_stats = {}
+
+
+def load_data(directory, compact=False, cache=True):
     """
     Load data from CSV files into memory.
+
+    With compact=True the person-movie links are kept in a CSRGraph
+    instead of per-person and per-movie sets, and unless cache is False
+    the loaded data is memory-mapped from (or saved to) a binary
+    snapshot next to the CSVs. Only the compact backend uses the
+    snapshot: the default one parses the CSVs on every start. Even from
+    the snapshot the names, people and movies tables are unpickled in
+    full; only the graph arrays are memory-mapped.
     """
+    global graph, name_index
+    name_index = None
+    if compact:
+        load_compact(directory, cache)
+        return
+    graph = None
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -51,16 +90,223 @@ def load_data(directory):
             except KeyError:
                 pass
 
+    label_components()
+
+
+def load_compact(directory, cache=True):
+    """
+    Load data from CSV files into memory, storing the
+    person-movie links in the global CSR graph.
+    """
+    global graph, components, component_sizes
+
+    if cache:
+        loaded = snapshot.load(directory)
+        if loaded is not None:
+            names.update(loaded[0])
+            people.update(loaded[1])
+            movies.update(loaded[2])
+            graph = loaded[3]
+            components, component_sizes = loaded[4], loaded[5]
+            return
+
+    person_ids = []
+    with open(f"{directory}/people.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            people[row["id"]] = {
+                "name": row["name"],
+                "birth": row["birth"]
+            }
+            person_ids.append(row["id"])
+            if row["name"].lower() not in names:
+                names[row["name"].lower()] = {row["id"]}
+            else:
+                names[row["name"].lower()].add(row["id"])
+
+    movie_ids = []
+    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            movies[row["id"]] = {
+                "title": row["title"],
+                "year": row["year"]
+            }
+            movie_ids.append(row["id"])
+
+    person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+    movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+    edge_people = array("i")
+    edge_movies = array("i")
+    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            try:
+                person = person_index[row["person_id"]]
+                movie = movie_index[row["movie_id"]]
+            except KeyError:
+                continue
+            edge_people.append(person)
+            edge_movies.append(movie)
+
+    graph = CSRGraph.from_edges(person_ids, movie_ids, edge_people, edge_movies)
+    label_components()
+
+    if cache:
+        try:
+            snapshot.save(directory, names, people, movies, graph,
+                          components, component_sizes)
+        except OSError:
+            pass  # Read-only data directory, just skip the cache
+
+
+def label_components():
+    """
+    Assigns every loaded person the id of its connected component,
+    visiting each person and each movie once.
+    """
+    global components, component_sizes
+
+    if graph is not None:
+        person_keys = range(len(graph.person_ids))
+        movies_of, stars_of = graph.movies_of, graph.stars_of
+        components = array("i", [-1]) * len(person_keys)
+    else:
+        person_keys = people
+        movies_of, stars_of = movies_for_person, stars_for_movie
+        components = dict.fromkeys(people, -1)
+    component_sizes = array("i")
+
+    explored_movies = set()
+    for person in person_keys:
+        if components[person] != -1:
+            continue
+        component = len(component_sizes)
+        components[person] = component
+        size = 1
+        queue = deque([person])
+        while queue:
+            current = queue.popleft()
+            for movie in movies_of(current):
+                if movie in explored_movies:
+                    continue
+                explored_movies.add(movie)
+                for star in stars_of(movie):
+                    if components[star] == -1:
+                        components[star] = component
+                        size += 1
+                        queue.append(star)
+        component_sizes.append(size)
+
+
+def connected(source, target):
+    """
+    Returns False if two person_ids are known to lie in different
+    components, so no path can exist between them.
+    """
+    if not component_sizes:
+        return True  # Components not labelled
+    if graph is not None:
+        source, target = graph.person_index[source], graph.person_index[target]
+    return components[source] == components[target]
+
+
+def component_stats():
+    """
+    Returns summary statistics about the sizes of the connected components.
+    """
+    sizes = sorted(component_sizes, reverse=True)
+    if not sizes:
+        return {"components": 0}
+    return {
+        "components": len(sizes),
+        "largest": sizes[0],
+        "median": sizes[len(sizes) // 2],
+        "singletons": sum(1 for size in sizes if size == 1),
+        "people": sum(sizes),
+        "top": sizes[:10]
+    }
+
+
+def load_landmarks(directory, count=4, cache=True):
+    """
+    Sets up the landmark oracle for the loaded data, reading it from
+    next to the CSVs when a fresh copy is there and building (and
+    saving) it otherwise. Call after load_data.
+    """
+    global oracle
+
+    built = False
+    if graph is not None:
+        person_ids, index = graph.person_ids, graph.person_index
+        movies_of, stars_of = graph.movies_of, graph.stars_of
+        # The oracle BFS runs over person numbers directly
+        numbers = range(len(person_ids))
+        if cache:
+            oracle = LandmarkOracle.load(directory, index)
+        if oracle is None:
+            oracle = LandmarkOracle.build(numbers, movies_of, stars_of, count)
+            oracle.index = index
+            built = True
+    else:
+        person_ids = list(people)
+        index = {person_id: i for i, person_id in enumerate(person_ids)}
+        if cache:
+            oracle = LandmarkOracle.load(directory, index)
+        if oracle is None:
+            oracle = LandmarkOracle.build(person_ids, movies_for_person,
+                                          stars_for_movie, count, index=index)
+            built = True
+
+    # A freshly loaded oracle is already on disk
+    if cache and built:
+        try:
+            oracle.save(directory)
+        except OSError:
+            pass
+
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(usage="python degrees.py [directory] [options]")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--compact", action="store_true",
+                        help="use the CSR graph backend and its snapshot cache; "
+                             "without it the CSVs are parsed on every start. The "
+                             "graph is memory-mapped from the snapshot, but the "
+                             "name, people and movie tables are still unpickled "
+                             "in full")
+    parser.add_argument("--landmarks", type=int, default=0, metavar="N",
+                        help="answer queries with A* guided by N landmark people")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="answer tab-separated name pairs from FILE ('-' for stdin) "
+                             "as JSON lines")
+    parser.add_argument("--cache-size", type=int, default=1024,
+                        help="results kept by the batch LRU cache")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes answering batch queries (needs --compact)")
+    args = parser.parse_args()
+    if args.workers > 1 and not args.compact:
+        parser.error("--workers needs --compact")
 
     # Load data from files into memory
-    print("Loading data...")
-    load_data(directory)
-    print("Data loaded.")
+    status = sys.stderr if args.batch else sys.stdout
+    print("Loading data...", file=status)
+    load_data(args.directory, compact=args.compact)
+    if args.landmarks:
+        load_landmarks(args.directory, args.landmarks)
+    print("Data loaded.", file=status)
+
+    if args.batch:
+        import batch
+        engine = batch.QueryEngine(args.cache_size)
+        if args.batch == "-":
+            batch.run(sys.stdin, sys.stdout, engine, args.directory, args.workers)
+        else:
+            with open(args.batch, encoding="utf-8") as f:
+                batch.run(f, sys.stdout, engine, args.directory, args.workers)
+        stats = engine.stats()
+        print(f"Cache hits: {stats['hits']}, misses: {stats['misses']}.", file=sys.stderr)
+        return
 
     source = person_id_for_name(input("Name: "))
     if source is None:
@@ -85,13 +331,30 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, bidirectional=True):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
     If no possible path, returns None.
     """
+    if not connected(source, target):
+        return None
+
+    if oracle is not None:
+        return astar_path(source, target)
+
+    if bidirectional and graph is not None:
+        path = bidirectional_path(graph.person_index[source],
+                                  graph.person_index[target],
+                                  graph.movies_of, graph.stars_of)
+        if path is None:
+            return None
+        return [(graph.movie_ids[movie], graph.person_ids[person])
+                for movie, person in path]
+
+    if bidirectional:
+        return bidirectional_path(source, target)
 
     # Inicialization
     start_node = Node(state=source, parent=None, action=None)
@@ -124,16 +387,198 @@ def shortest_path(source, target):
                     return path
                 frontier.add(child_node)
                 
-    raise None
+    return None
+
+
+def bidirectional_path(source, target, movies_of=None, stars_of=None):
+    """
+    Same contract as shortest_path, but searches from both ends at once.
+    movies_of and stars_of default to movies_for_person and
+    stars_for_movie; the CSR backend passes its own so the search runs
+    over integer ids.
+
+    Each side keeps a QueueFrontier and a map of person_id -> Node whose
+    parents lead back to its own endpoint. On every round the side with
+    the smaller frontier expands one whole level; the search stops at the
+    end of the first level in which the two sides meet.
+
+    Movies are explored nodes too: once a side has scanned a movie's
+    stars, every one of them is already in that side's tree, so the
+    movie is never scanned again by that side. The savings are recorded
+    in search_stats.
+    """
+    if movies_of is None:
+        movies_of = movies_for_person
+    if stars_of is None:
+        stars_of = stars_for_movie
+
+    search_stats.clear()
+    search_stats.update(people_expanded=0, movies_expanded=0,
+                        movies_skipped=0, stars_skipped=0)
+    if source == target:
+        return []
+
+    forward = {source: Node(state=source, parent=None, action=None)}
+    backward = {target: Node(state=target, parent=None, action=None)}
+    forward_frontier = QueueFrontier()
+    forward_frontier.add(forward[source])
+    backward_frontier = QueueFrontier()
+    backward_frontier.add(backward[target])
+    forward_movies = set()
+    backward_movies = set()
+
+    while not forward_frontier.empty() and not backward_frontier.empty():
+
+        # Always grow the cheaper side
+        if len(forward_frontier) <= len(backward_frontier):
+            frontier, visited, other = forward_frontier, forward, backward
+            explored_movies = forward_movies
+        else:
+            frontier, visited, other = backward_frontier, backward, forward
+            explored_movies = backward_movies
+
+        meeting = None
+        for _ in range(len(frontier)):
+            current_node = frontier.remove()
+            search_stats["people_expanded"] += 1
+            for movie_id in movies_of(current_node.state):
+                stars = stars_of(movie_id)
+                if movie_id in explored_movies:
+                    search_stats["movies_skipped"] += 1
+                    search_stats["stars_skipped"] += len(stars)
+                    continue
+                explored_movies.add(movie_id)
+                search_stats["movies_expanded"] += 1
+                for person_id in stars:
+                    if person_id in visited:
+                        continue
+                    child_node = Node(state=person_id, parent=current_node, action=movie_id)
+                    visited[person_id] = child_node
+                    frontier.add(child_node)
+                    if person_id in other:
+                        cost = _depth(forward[person_id]) + _depth(backward[person_id])
+                        if meeting is None or cost < meeting[0]:
+                            meeting = (cost, person_id)
+
+        if meeting is not None:
+            return _join(forward[meeting[1]], backward[meeting[1]])
+
+    return None
+
+
+def astar_path(source, target):
+    """
+    Same contract as shortest_path, using A* search guided by the landmark
+    oracle. The landmark lower bound never overestimates the remaining
+    hops and is consistent, so the first time the target is removed from
+    the frontier its path is a shortest one.
+
+    Movies are not pruned here: A* expands people in order of estimated
+    total cost rather than depth, so a movie first seen from one person
+    can later be reached more cheaply through another.
+    """
+    search_stats.clear()
+    search_stats.update(people_expanded=0, movies_expanded=0)
+
+    if graph is not None:
+        start, goal = graph.person_index[source], graph.person_index[target]
+        movies_of, stars_of = graph.movies_of, graph.stars_of
+        estimate = oracle.heuristic(goal)
+    else:
+        start, goal = source, target
+        movies_of, stars_of = movies_for_person, stars_for_movie
+        goal_number = oracle.index[target]
+        estimate = lambda person: oracle.number_bounds(oracle.index[person], goal_number)[0]
+
+    if estimate(start) == float("inf"):
+        return None  # A landmark reaches exactly one of them
+
+    costs = {start: 0}
+    closed = set()
+    frontier = PriorityFrontier()
+    frontier.add(Node(state=start, parent=None, action=None), (estimate(start), 0))
+
+    while not frontier.empty():
+        current_node = frontier.remove()
+        if current_node.state in closed:
+            continue  # Stale entry, already reached more cheaply
+        if current_node.state == goal:
+            path = []
+            while current_node.parent is not None:
+                path.append((current_node.action, current_node.state))
+                current_node = current_node.parent
+            path.reverse()
+            if graph is not None:
+                path = [(graph.movie_ids[movie], graph.person_ids[person])
+                        for movie, person in path]
+            return path
+
+        closed.add(current_node.state)
+        search_stats["people_expanded"] += 1
+        cost = costs[current_node.state] + 1
+        for movie_id in movies_of(current_node.state):
+            search_stats["movies_expanded"] += 1
+            for person_id in stars_of(movie_id):
+                if person_id in closed or costs.get(person_id, cost + 1) <= cost:
+                    continue
+                remaining = estimate(person_id)
+                if remaining == float("inf"):
+                    continue
+                costs[person_id] = cost
+                child_node = Node(state=person_id, parent=current_node, action=movie_id)
+                # Prefer deeper nodes among equal estimates
+                frontier.add(child_node, (cost + remaining, -cost))
+
+    return None
+
+
+def _depth(node):
+    """
+    Returns how many hops node is from the root of its search tree.
+    """
+    depth = 0
+    while node.parent is not None:
+        node = node.parent
+        depth += 1
+    return depth
+
+
+def _join(forward_node, backward_node):
+    """
+    Builds the (movie_id, person_id) path through the person where
+    a forward and a backward search tree meet.
+    """
+    path = []
+    while forward_node.parent is not None:
+        path.append((forward_node.action, forward_node.state))
+        forward_node = forward_node.parent
+    path.reverse()
+
+    while backward_node.parent is not None:
+        path.append((backward_node.action, backward_node.parent.state))
+        backward_node = backward_node.parent
+    return path
 
 
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    When no name matches exactly, offers the closest names
+    (by prefix or within a couple of typos) to choose from.
     """
     person_ids = list(names.get(name.lower(), set()))
     if len(person_ids) == 0:
+        candidates = get_name_index().candidates(name, people)
+        if not candidates:
+            return None
+        print(f"No exact match for '{name}'. Did you mean:")
+        for person_id, name, birth, _ in candidates:
+            print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
+        person_id = input("Intended Person ID: ")
+        if person_id in {candidate[0] for candidate in candidates}:
+            return person_id
         return None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
@@ -153,11 +598,45 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def get_name_index():
+    """
+    Returns the NameIndex over the loaded names, building it the first
+    time it is needed. Candidates with more movies rank first.
+    """
+    global name_index
+    if name_index is None:
+        if graph is not None:
+            weight = lambda person_id: graph.degree(graph.person_index[person_id])
+        else:
+            weight = lambda person_id: len(people[person_id]["movies"])
+        name_index = NameIndex(names, weight)
+    return name_index
+
+
+def movies_for_person(person_id):
+    """
+    Returns the movie_ids a given person starred in.
+    """
+    return people[person_id]["movies"]
+
+
+def stars_for_movie(movie_id):
+    """
+    Returns the person_ids who starred in a given movie.
+    """
+    return movies[movie_id]["stars"]
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
+    if graph is not None:
+        person = graph.person_index[person_id]
+        return {(graph.movie_ids[movie], graph.person_ids[neighbor])
+                for movie, neighbor in graph.neighbors(person)}
+
     movie_ids = people[person_id]["movies"]
     neighbors = set()
     for movie_id in movie_ids:
@@ -167,4 +646,6 @@ def neighbors_for_person(person_id):
 
 
 if __name__ == "__main__":
+    # Let modules that import degrees (batch) share this copy's data
+    sys.modules.setdefault("degrees", sys.modules[__name__])
     main()
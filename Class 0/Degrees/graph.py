@@ -0,0 +1,84 @@
+from array import array
+
+
+class CSRGraph():
+    """
+    Person-movie graph stored as CSR (compressed sparse row) arrays.
+
+    People and movies are renumbered to dense integers 0..n-1. The movies
+    of person i are person_movies[person_offsets[i]:person_offsets[i + 1]]
+    and the stars of movie j are
+    movie_people[movie_offsets[j]:movie_offsets[j + 1]].
+    """
+
+    def __init__(self, person_ids, movie_ids, person_offsets, person_movies,
+                 movie_offsets, movie_people):
+        self.person_ids = person_ids
+        self.movie_ids = movie_ids
+        self.person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        self.movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_people = movie_people
+
+    @classmethod
+    def from_edges(cls, person_ids, movie_ids, edge_people, edge_movies):
+        """
+        Builds the graph from parallel arrays of (person, movie) integer
+        edges, using a counting sort so no per-node containers are needed.
+        """
+        person_offsets, person_movies = _csr(len(person_ids), edge_people, edge_movies)
+        movie_offsets, movie_people = _csr(len(movie_ids), edge_movies, edge_people)
+        return cls(person_ids, movie_ids, person_offsets, person_movies,
+                   movie_offsets, movie_people)
+
+    def movies_of(self, person):
+        """
+        Returns the movie numbers of the given person number.
+        """
+        return self.person_movies[self.person_offsets[person]:self.person_offsets[person + 1]]
+
+    def stars_of(self, movie):
+        """
+        Returns the person numbers that starred in the given movie number.
+        """
+        return self.movie_people[self.movie_offsets[movie]:self.movie_offsets[movie + 1]]
+
+    def neighbors(self, person):
+        """
+        Yields (movie, person) number pairs for people
+        who starred with the given person number.
+        """
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_people = self.movie_people
+        for i in range(person_offsets[person], person_offsets[person + 1]):
+            movie = person_movies[i]
+            for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                yield movie, movie_people[j]
+
+    def degree(self, person):
+        """
+        Returns how many movies the given person number starred in.
+        """
+        return self.person_offsets[person + 1] - self.person_offsets[person]
+
+
+def _csr(size, rows, columns):
+    """
+    Groups columns by row into (offsets, indices) arrays.
+    """
+    offsets = array("i", bytes(4 * (size + 1)))
+    for row in rows:
+        offsets[row + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+
+    indices = array("i", bytes(4 * len(rows)))
+    cursor = offsets[:-1]
+    for row, column in zip(rows, columns):
+        indices[cursor[row]] = column
+        cursor[row] += 1
+    return offsets, indices
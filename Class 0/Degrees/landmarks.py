@@ -0,0 +1,150 @@
+import os
+import pickle
+import struct
+import sys
+from array import array
+from collections import deque
+
+import snapshot
+
+# Bump whenever the file layout changes so old oracles are rebuilt
+VERSION = 1
+
+MAGIC = b"DEGLAND\0"
+FILENAME = "landmarks.bin"
+
+# Magic, version, header length
+PREFIX = struct.Struct("<8sIQ")
+
+# Distance stored for people a landmark cannot reach
+UNREACHABLE = 0xFFFF
+
+
+class LandmarkOracle():
+    """
+    BFS distances from a few well-connected "landmark" people to everyone.
+
+    People are numbered in load order (the order of people.csv), which is
+    the same numbering the CSR graph uses. By the triangle inequality,
+    |d(L, a) - d(L, b)| <= d(a, b) <= d(L, a) + d(L, b) for every
+    landmark L, which gives instant bounds on separation and an
+    admissible, consistent heuristic for A* search.
+    """
+
+    def __init__(self, landmarks, distances, index):
+        self.landmarks = landmarks
+        self.distances = distances  # one array("H") per landmark
+        self.index = index  # person_id -> person number
+
+    @classmethod
+    def build(cls, person_ids, movies_of, stars_of, count=4, index=None):
+        """
+        Picks the count people with the most movies as landmarks and runs
+        a BFS from each. person_ids lists every person in load order, and
+        movies_of/stars_of expand them the way degrees searches do.
+        index maps person_ids to person numbers; leave it out when
+        person_ids already are the numbers, range(n), as with the CSR graph.
+        """
+        if index is None:
+            index = range(len(person_ids))  # range(n)[i] == i, without a dict
+        by_degree = sorted(range(len(person_ids)),
+                           key=lambda i: len(movies_of(person_ids[i])),
+                           reverse=True)
+        landmarks = by_degree[:count]
+
+        distances = []
+        for landmark in landmarks:
+            distance = array("H", [UNREACHABLE]) * len(person_ids)
+            distance[landmark] = 0
+            queue = deque([person_ids[landmark]])
+            explored_movies = set()
+            while queue:
+                person = queue.popleft()
+                hops = distance[index[person]] + 1
+                for movie in movies_of(person):
+                    if movie in explored_movies:
+                        continue
+                    explored_movies.add(movie)
+                    for star in stars_of(movie):
+                        if distance[index[star]] == UNREACHABLE:
+                            distance[index[star]] = min(hops, UNREACHABLE - 1)
+                            queue.append(star)
+            distances.append(distance)
+        return cls(landmarks, distances, index)
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper) bounds on the degrees of separation between
+        two person_ids. lower is infinite when some landmark reaches
+        exactly one of them; upper is infinite when no landmark reaches both.
+        """
+        return self.number_bounds(self.index[source], self.index[target])
+
+    def number_bounds(self, source, target):
+        """
+        Same as bounds, for person numbers.
+        """
+        lower = 0
+        upper = float("inf")
+        for distance in self.distances:
+            a = distance[source]
+            b = distance[target]
+            if a == UNREACHABLE and b == UNREACHABLE:
+                continue
+            if a == UNREACHABLE or b == UNREACHABLE:
+                return float("inf"), float("inf")
+            lower = max(lower, abs(a - b))
+            upper = min(upper, a + b)
+        return lower, upper
+
+    def heuristic(self, target):
+        """
+        Returns a function estimating the hops from a person number to
+        target, never overestimating them.
+        """
+        return lambda person: self.number_bounds(person, target)[0]
+
+    def save(self, directory):
+        """
+        Writes the oracle next to the dataset it was built from.
+        """
+        header = pickle.dumps({
+            "signature": snapshot.signature(directory),
+            "byteorder": sys.byteorder,
+            "landmarks": self.landmarks,
+            "size": len(self.distances[0]) if self.distances else 0
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+        path = os.path.join(directory, FILENAME)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(PREFIX.pack(MAGIC, VERSION, len(header)))
+            f.write(header)
+            for distance in self.distances:
+                distance.tofile(f)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, directory, index):
+        """
+        Reads the oracle saved for a dataset whose people are numbered by
+        index, or returns None if it is missing or stale.
+        """
+        size = len(index)
+        try:
+            with open(os.path.join(directory, FILENAME), "rb") as f:
+                magic, version, length = PREFIX.unpack(f.read(PREFIX.size))
+                if magic != MAGIC or version != VERSION:
+                    return None
+                header = pickle.loads(f.read(length))
+                if (header["signature"] != snapshot.signature(directory)
+                        or header["byteorder"] != sys.byteorder
+                        or header["size"] != size):
+                    return None
+                distances = []
+                for _ in header["landmarks"]:
+                    distance = array("H")
+                    distance.fromfile(f, size)
+                    distances.append(distance)
+        except (OSError, EOFError, struct.error, pickle.UnpicklingError, KeyError):
+            return None
+        return cls(header["landmarks"], distances, index)
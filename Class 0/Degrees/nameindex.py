@@ -0,0 +1,168 @@
+import bisect
+from array import array
+
+# Names starting with the text that candidates ranks by weight before
+# cutting to its limit, so popular names deep in the alphabet still show
+PREFIX_WINDOW = 1000
+
+
+class NameIndex():
+    """
+    Lookup structure over lowercase person names supporting prefix
+    completion and typo-tolerant search.
+
+    Prefix queries bisect a sorted list of names. Fuzzy queries use a
+    trigram inverted index: a name within edit distance d of the query
+    shares all but at most 3 * d of the query's trigrams, so it appears in
+    the postings of at least one of the 3 * d + 1 rarest of them. Only
+    those postings are read, only names with enough shared trigrams have
+    their edit distance computed, and that computation stops as soon as it
+    exceeds the limit.
+    """
+
+    def __init__(self, names, weight=None):
+        """
+        names maps lowercase names to sets of person_ids, as in degrees.
+        weight, if given, maps a person_id to a popularity score used to
+        rank equally close candidates (for example their movie count).
+        """
+        self.names = names
+        self.weight = weight
+        self.sorted_names = sorted(names)
+        self.postings = {}  # trigram -> array of positions in sorted_names
+        self.by_length = {}  # name length -> array of positions
+        for position, name in enumerate(self.sorted_names):
+            for gram in trigrams(name):
+                if gram not in self.postings:
+                    self.postings[gram] = array("i")
+                self.postings[gram].append(position)
+            if len(name) not in self.by_length:
+                self.by_length[len(name)] = array("i")
+            self.by_length[len(name)].append(position)
+
+    def prefix(self, text, limit=10):
+        """
+        Returns up to limit names starting with text, in alphabetical order.
+        """
+        text = text.lower()
+        start = bisect.bisect_left(self.sorted_names, text)
+        matches = []
+        for name in self.sorted_names[start:start + limit]:
+            if not name.startswith(text):
+                break
+            matches.append(name)
+        return matches
+
+    def fuzzy(self, text, max_distance=2):
+        """
+        Returns (distance, name) pairs for every name within max_distance
+        edits of text, closest first.
+        """
+        text = text.lower()
+        grams = trigrams(text)
+        needed = len(grams) - 3 * max_distance
+
+        if needed > 0:
+            # Prefix filtering: a match holds needed of the grams, so it
+            # holds at least one of the len(grams) - needed + 1 rarest.
+            # Only their postings are scanned; the other grams are looked
+            # up in their sorted postings for the names found there
+            rarest = sorted(grams, key=lambda gram: len(self.postings.get(gram, ())))
+            split = len(grams) - needed + 1
+            counts = {}
+            for gram in rarest[:split]:
+                for position in self.postings.get(gram, ()):
+                    counts[position] = counts.get(position, 0) + 1
+            rest = [self.postings[gram] for gram in rarest[split:] if gram in self.postings]
+            candidates = []
+            for position, count in counts.items():
+                if abs(len(self.sorted_names[position]) - len(text)) > max_distance:
+                    continue
+                for checked, posting in enumerate(rest):
+                    if count >= needed or count + len(rest) - checked < needed:
+                        break
+                    i = bisect.bisect_left(posting, position)
+                    if i < len(posting) and posting[i] == position:
+                        count += 1
+                if count >= needed:
+                    candidates.append(position)
+        else:
+            # Too short for the trigram filter, fall back to the length filter
+            candidates = []
+            for length in range(len(text) - max_distance, len(text) + max_distance + 1):
+                candidates.extend(self.by_length.get(length, ()))
+
+        matches = []
+        for position in candidates:
+            name = self.sorted_names[position]
+            distance = edit_distance(text, name, max_distance)
+            if distance <= max_distance:
+                matches.append((distance, name))
+        matches.sort()
+        return matches
+
+    def candidates(self, text, people, limit=10, max_distance=2):
+        """
+        Returns up to limit ranked (person_id, name, birth, distance)
+        candidates for text. Exact matches come first, then names that
+        start with text (distance 0), then names within max_distance
+        edits. Ties are broken by weight, most popular first.
+        """
+        text = text.lower()
+        ranked = {}  # name -> (rank, distance)
+        for name in self.prefix(text, max(limit, PREFIX_WINDOW)):
+            ranked[name] = (0, 0) if name == text else (1, 0)
+        for distance, name in self.fuzzy(text, max_distance):
+            ranked.setdefault(name, (0, 0) if distance == 0 else (1 + distance, distance))
+
+        results = []
+        for name, key in ranked.items():
+            for person_id in self.names[name]:
+                weight = self.weight(person_id) if self.weight else 0
+                results.append((key, -weight, name, person_id))
+        results.sort()
+
+        return [(person_id, people[person_id]["name"], people[person_id]["birth"], key[1])
+                for key, _, _, person_id in results[:limit]]
+
+
+def trigrams(text):
+    """
+    Returns the set of padded 3-character substrings of text.
+    """
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """
+    Returns the Levenshtein distance between a and b,
+    or limit + 1 as soon as it is known to exceed limit.
+
+    Only the band of cells within limit of the diagonal is computed:
+    the others are more than limit apart, and stand in as limit + 1.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    outside = limit + 1
+    width = len(b) + 1
+    previous = [j if j <= limit else outside for j in range(width)]
+    for i in range(1, len(a) + 1):
+        current = [outside] * width
+        if i <= limit:
+            current[0] = i
+        best = current[0]
+        char = a[i - 1]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            cost = previous[j - 1] + (char != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost
+            if cost < best:
+                best = cost
+        if best > limit:
+            return outside
+        previous = current
+    return min(previous[-1], outside)
@@ -0,0 +1,163 @@
+import mmap
+import os
+import pickle
+import struct
+import sys
+from array import array
+
+from graph import CSRGraph
+
+# Bump whenever the layout below changes so old snapshots are rebuilt
+VERSION = 3
+
+MAGIC = b"DEGSNAP\0"
+FILENAME = "degrees.snapshot"
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+# Magic, version, header length
+PREFIX = struct.Struct("<8sIQ")
+
+# CSR arrays, in the order they are stored after the header,
+# followed by the component labels and sizes and then the pickled tables
+ARRAYS = ("person_offsets", "person_movies", "movie_offsets", "movie_people")
+
+
+def path_for(directory):
+    """
+    Returns the snapshot path for a data directory.
+    """
+    return os.path.join(directory, FILENAME)
+
+
+def signature(directory):
+    """
+    Returns the (name, size, mtime) of every source CSV, which a snapshot
+    must match to be used.
+    """
+    result = []
+    for name in SOURCES:
+        stat = os.stat(os.path.join(directory, name))
+        result.append((name, stat.st_size, stat.st_mtime_ns))
+    return result
+
+
+def save(directory, names, people, movies, graph, components, component_sizes):
+    """
+    Writes the loaded tables, CSR graph and component labels next to the CSVs.
+    The file is written under a temporary name and then renamed,
+    so readers never see a partial snapshot.
+
+    The header only holds what is needed to find the arrays; the name and
+    title tables are pickled after them, so processes that only search
+    the graph never have to unpickle them.
+    """
+    arrays = [getattr(graph, name) for name in ARRAYS] + [components, component_sizes]
+    header = pickle.dumps({
+        "signature": signature(directory),
+        "byteorder": sys.byteorder,
+        "lengths": [len(values) for values in arrays]
+    }, protocol=pickle.HIGHEST_PROTOCOL)
+    tables = pickle.dumps({
+        "names": names,
+        "people": people,
+        "movies": movies,
+        "person_ids": graph.person_ids,
+        "movie_ids": graph.movie_ids
+    }, protocol=pickle.HIGHEST_PROTOCOL)
+
+    path = path_for(directory)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(PREFIX.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        f.write(bytes(-f.tell() % 4))  # Align the arrays for memoryview.cast
+        for values in arrays:
+            if not isinstance(values, array):
+                values = array("i", values)
+            values.tofile(f)
+        f.write(tables)
+    os.replace(temporary, path)
+
+
+def load(directory):
+    """
+    Memory-maps the snapshot of a data directory.
+
+    Returns (names, people, movies, graph, components, component_sizes),
+    or None if there is no snapshot or it is stale, from another version
+    or unreadable.
+    """
+    opened = load_arrays(directory)
+    if opened is None:
+        return None
+    arrays, mapping, end = opened
+    try:
+        tables = pickle.loads(mapping[end:])
+    except (pickle.UnpicklingError, EOFError):
+        return None
+
+    graph = CSRGraph(tables["person_ids"], tables["movie_ids"], *arrays[:4])
+    return (tables["names"], tables["people"], tables["movies"], graph,
+            arrays[4], arrays[5])
+
+
+def usable(directory):
+    """
+    Returns whether a data directory has a snapshot load_arrays can use,
+    reading only its header instead of mapping the file.
+    """
+    try:
+        with open(path_for(directory), "rb") as f:
+            magic, version, length = PREFIX.unpack(f.read(PREFIX.size))
+            if magic != MAGIC or version != VERSION:
+                return False
+            header = pickle.loads(f.read(length))
+            size = os.fstat(f.fileno()).st_size
+        if (header["byteorder"] != sys.byteorder
+                or header["signature"] != signature(directory)):
+            return False
+    except (OSError, struct.error, pickle.UnpicklingError, EOFError, KeyError):
+        return False
+
+    offset = PREFIX.size + length
+    offset += -offset % 4
+    return offset + 4 * sum(header["lengths"]) <= size
+
+
+def load_arrays(directory):
+    """
+    Memory-maps only the arrays of a snapshot: the four CSR arrays, then
+    the component labels and sizes.
+
+    Returns (arrays, mapping, end), where end is the offset just past the
+    arrays, or None if the snapshot is missing or unusable. The arrays are
+    views into the mapping, so they are paged in on demand and shared
+    with every other process mapping the same file.
+    """
+    try:
+        with open(path_for(directory), "rb") as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        magic, version, length = PREFIX.unpack_from(mapping)
+        if magic != MAGIC or version != VERSION:
+            return None
+        header = pickle.loads(mapping[PREFIX.size:PREFIX.size + length])
+        if (header["byteorder"] != sys.byteorder
+                or header["signature"] != signature(directory)):
+            return None
+    except (OSError, struct.error, pickle.UnpicklingError, EOFError, KeyError):
+        return None
+
+    offset = PREFIX.size + length
+    offset += -offset % 4
+    if offset + 4 * sum(header["lengths"]) > len(mapping):
+        return None
+    view = memoryview(mapping)
+    arrays = []
+    for size in header["lengths"]:
+        arrays.append(view[offset:offset + 4 * size].cast("i"))
+        offset += 4 * size
+    return arrays, mapping, offset
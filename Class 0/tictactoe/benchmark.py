@@ -0,0 +1,106 @@
+"""
+Benchmarks the Tic Tac Toe engines on every opening position.
+
+Usage: python benchmark.py [rows cols [k]] [--engines alphabeta deepening ...]
+
+The openings are the empty board and every position reachable from it in
+--plies moves, one per symmetry class. Each engine picks a move in every
+opening with a fresh transposition table, and the work it reports (see
+tictactoe.search_stats) is summed into one row of a throughput table.
+"""
+
+import argparse
+import time
+
+import bitboard
+import mcts
+import parallel
+import tictactoe as ttt
+
+ENGINES = ["alphabeta", "deepening", "parallel", "mcts"]
+
+
+def openings(rows, cols, k, plies):
+    """
+    Returns the non-terminal boards at most plies moves into the game,
+    one per symmetry class.
+    """
+    boards = []
+    seen = set()
+    frontier = [ttt.initial_state(rows, cols, k)]
+    for ply in range(plies + 1):
+        following = []
+        for board in frontier:
+            key = ttt.canonical(board)
+            if key in seen or ttt.terminal(board):
+                continue
+            seen.add(key)
+            boards.append(board)
+            if ply < plies:
+                following.extend(ttt.result(board, action) for action in ttt.actions(board))
+        frontier = following
+    return boards
+
+
+def decide(engine, board, time_budget, workers):
+    """
+    Returns the stats of one decision by engine on board.
+    """
+    ttt.reset_stats()
+    ttt.transpositions.clear()
+    stats = ttt.search_stats
+    geometry = bitboard.geometry_for(board)
+    position = bitboard.from_board(board, geometry)
+    start = time.perf_counter()
+    if engine == "alphabeta":
+        ttt.search(board)
+    elif engine == "deepening":
+        bitboard.deepening(position, geometry, time_budget, stats=stats)
+    elif engine == "parallel":
+        parallel.deepening(position, geometry, time_budget, workers=workers, stats=stats)
+    else:
+        mcts._root = None
+        mcts.minimax(board, time_budget=time_budget)
+        stats["nodes"] = mcts.stats["playouts"]
+        stats["max_depth"] = mcts.stats["max_depth"]
+    stats["seconds"] = time.perf_counter() - start
+    return dict(stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(usage="python benchmark.py [rows cols [k]] [options]")
+    parser.add_argument("shape", type=int, nargs="*", help="rows cols [k] (default 3 3)")
+    parser.add_argument("--engines", nargs="+", default=["alphabeta", "deepening"],
+                        choices=ENGINES)
+    parser.add_argument("--plies", type=int, default=1,
+                        help="moves into the game the openings go")
+    parser.add_argument("--time-budget", type=float, default=ttt.TIME_BUDGET,
+                        help="seconds per move for the time-limited engines")
+    parser.add_argument("--workers", type=int, default=2,
+                        help="processes for the parallel engine")
+    args = parser.parse_args()
+    if len(args.shape) not in (0, 2, 3):
+        parser.error("give the board as rows cols [k]")
+    rows, cols = args.shape[:2] if args.shape else (3, 3)
+    k = args.shape[2] if len(args.shape) == 3 else None
+
+    boards = openings(rows, cols, k, args.plies)
+    print(f"{len(boards)} openings on {rows}x{cols}, "
+          f"{ttt.win_length(boards[0])} in a row")
+    print(f"{'engine':10} {'nodes':>10} {'nodes/s':>10} {'cache hits':>10} "
+          f"{'cutoffs':>10} {'max depth':>9} {'seconds':>8}")
+    for engine in args.engines:
+        total = {"nodes": 0, "cache_hits": 0, "cutoffs": 0, "max_depth": 0, "seconds": 0.0}
+        for board in boards:
+            stats = decide(engine, board, args.time_budget, args.workers)
+            for key in ("nodes", "cache_hits", "cutoffs", "seconds"):
+                total[key] += stats[key]
+            total["max_depth"] = max(total["max_depth"], stats["max_depth"])
+        rate = total["nodes"] / total["seconds"] if total["seconds"] else 0
+        print(f"{engine:10} {total['nodes']:>10} {rate:>10.0f} {total['cache_hits']:>10} "
+              f"{total['cutoffs']:>10} {total['max_depth']:>9} {total['seconds']:>8.2f}")
+    parallel.shutdown()
+
+
+if __name__ == "__main__":
+    main()
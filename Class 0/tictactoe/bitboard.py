@@ -0,0 +1,440 @@
+"""
+Bitboard Tic Tac Toe engine.
+
+A position is a pair (x, o) of integers: bit i * cols + j of x is set
+when X has played cell (i, j), and likewise for o. Positions are
+immutable, moves are single bit operations, wins are found by testing
+precomputed line masks and the player to move comes from popcounts.
+from_board and to_board convert to and from the list-of-lists boards
+used by tictactoe.py and runner.py.
+"""
+
+import math
+import time
+
+import tictactoe as ttt
+
+# Score of a won position; heuristic scores must stay well below it
+WIN = 10 ** 9
+
+# Boards with more cells than this only consider moves near existing marks
+CROWDED = 49
+NEAR = 2
+
+
+class Geometry():
+    """
+    Masks for a rows x cols board where k in a row wins.
+    """
+
+    def __init__(self, rows=3, cols=3, k=3):
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        self.cells = rows * cols
+        self.full = (1 << self.cells) - 1
+
+        # Every run of k cells in a row, column or diagonal, and for each
+        # cell the runs through it: only those can be completed by a move there
+        self.lines = []
+        self.through = [[] for _ in range(self.cells)]
+        for i in range(rows):
+            for j in range(cols):
+                for di, dj in ttt.DIRECTIONS:
+                    end_i, end_j = i + di * (k - 1), j + dj * (k - 1)
+                    if 0 <= end_i < rows and 0 <= end_j < cols:
+                        cells = [(i + di * step) * cols + j + dj * step for step in range(k)]
+                        mask = 0
+                        for cell in cells:
+                            mask |= 1 << cell
+                        self.lines.append(mask)
+                        for cell in cells:
+                            self.through[cell].append(mask)
+
+        # Center first, then corners, then edges
+        self.order = sorted(range(self.cells), key=lambda cell: (
+            ttt.placement(divmod(cell, cols), rows, cols), cell))
+
+        # On big boards, cell -> mask of the cells within NEAR of it
+        self.near = None
+        if self.cells > CROWDED:
+            self.near = []
+            for cell in range(self.cells):
+                i, j = divmod(cell, cols)
+                mask = 0
+                for ni in range(max(0, i - NEAR), min(rows, i + NEAR + 1)):
+                    for nj in range(max(0, j - NEAR), min(cols, j + NEAR + 1)):
+                        mask |= 1 << (ni * cols + nj)
+                self.near.append(mask)
+
+    def moves(self, taken):
+        """
+        Returns the mask of cells worth playing: every empty cell, or on
+        big boards only those near a mark (the center if there are none).
+        """
+        empty = self.full & ~taken
+        if self.near is None:
+            return empty
+        if not taken:
+            return 1 << self.order[0]
+        mask = 0
+        cell = 0
+        while taken >> cell:
+            if taken >> cell & 1:
+                mask |= self.near[cell]
+            cell += 1
+        return mask & empty
+
+    def bit(self, action):
+        i, j = action
+        if not (0 <= i < self.rows and 0 <= j < self.cols):
+            raise ValueError("Action outside the board limits.")
+        return 1 << (i * self.cols + j)
+
+
+# Shared geometry for classic Tic Tac Toe
+CLASSIC = Geometry()
+
+# (rows, cols, k) -> Geometry
+_geometries = {(3, 3, 3): CLASSIC}
+
+
+def geometry_for(board):
+    """
+    Returns the Geometry matching a list-of-lists board.
+    """
+    key = (len(board), len(board[0]), ttt.win_length(board))
+    if key not in _geometries:
+        _geometries[key] = Geometry(*key)
+    return _geometries[key]
+
+
+def popcount(mask):
+    return bin(mask).count("1")
+
+
+def from_board(board, geometry=CLASSIC):
+    """
+    Returns the (x, o) position for a list-of-lists board.
+    """
+    x = o = 0
+    for i, row in enumerate(board):
+        for j, cell in enumerate(row):
+            if cell == ttt.X:
+                x |= 1 << (i * geometry.cols + j)
+            elif cell == ttt.O:
+                o |= 1 << (i * geometry.cols + j)
+    return x, o
+
+
+def to_board(position, geometry=CLASSIC):
+    """
+    Returns the list-of-lists board for an (x, o) position.
+    """
+    x, o = position
+    board = []
+    for i in range(geometry.rows):
+        row = []
+        for j in range(geometry.cols):
+            bit = 1 << (i * geometry.cols + j)
+            row.append(ttt.X if x & bit else ttt.O if o & bit else ttt.EMPTY)
+        board.append(row)
+    return board
+
+
+def player(position):
+    """
+    Returns player who has the next turn in a position.
+    """
+    x, o = position
+    return ttt.X if popcount(x) == popcount(o) else ttt.O
+
+
+def actions(position, geometry=CLASSIC):
+    """
+    Returns the list of empty cells (i, j), center first.
+    """
+    x, o = position
+    taken = x | o
+    return [divmod(cell, geometry.cols) for cell in geometry.order
+            if not taken >> cell & 1]
+
+
+def result(position, action, geometry=CLASSIC):
+    """
+    Returns the position after the player to move plays action.
+    """
+    bit = geometry.bit(action)
+    x, o = position
+    if (x | o) & bit:
+        raise ValueError("The cell is already busy")
+    if popcount(x) == popcount(o):
+        return x | bit, o
+    return x, o | bit
+
+
+def winner(position, geometry=CLASSIC):
+    """
+    Returns the winner of a position, if there is one.
+    """
+    x, o = position
+    for line in geometry.lines:
+        if x & line == line:
+            return ttt.X
+        if o & line == line:
+            return ttt.O
+    return None
+
+
+def terminal(position, geometry=CLASSIC):
+    x, o = position
+    return (x | o) == geometry.full or winner(position, geometry) is not None
+
+
+def utility(position, geometry=CLASSIC):
+    win = winner(position, geometry)
+    return 1 if win == ttt.X else -1 if win == ttt.O else 0
+
+
+def best_move(position, geometry=CLASSIC):
+    """
+    Returns the optimal action (i, j) for the player to move, or None
+    if the game is over. Searches with negamax and alpha-beta, scoring
+    positions for the side to move.
+    """
+    if terminal(position, geometry):
+        return None
+    table = {}
+    mine, theirs = position if player(position) == ttt.X else position[::-1]
+    stones = popcount(mine | theirs)
+    best_score = -math.inf
+    best_cell = None
+    for cell in geometry.order:
+        bit = 1 << cell
+        if (mine | theirs) & bit:
+            continue
+        score = -_negamax(theirs, mine | bit, -math.inf, -best_score, geometry, table,
+                          cell, stones + 1)
+        if score > best_score:
+            best_score = score
+            best_cell = cell
+    return divmod(best_cell, geometry.cols)
+
+
+def _negamax(mine, theirs, alpha, beta, geometry, table, last, stones):
+    """
+    Returns the value of a position for the side owning mine, which is
+    to move. theirs has just played cell last, so only a line through
+    last can have been completed; stones counts the marks on the board.
+    """
+    for line in geometry.through[last]:
+        if theirs & line == line:
+            return -1
+    if stones == geometry.cells:
+        return 0
+    taken = mine | theirs
+
+    key = (mine, theirs)
+    if key in table:
+        value, flag = table[key]
+        if flag == ttt.EXACT:
+            return value
+        if flag == ttt.LOWER:
+            alpha = max(alpha, value)
+        else:
+            beta = min(beta, value)
+        if alpha >= beta:
+            return value
+
+    window = (alpha, beta)
+    value = -math.inf
+    for cell in geometry.order:
+        bit = 1 << cell
+        if taken & bit:
+            continue
+        value = max(value, -_negamax(theirs, mine | bit, -beta, -alpha, geometry, table,
+                                     cell, stones + 1))
+        alpha = max(alpha, value)
+        if alpha >= beta:
+            break
+    table[key] = (value, ttt.bound(value, *window))
+    return value
+
+
+class Timeout(Exception):
+    pass
+
+
+def line_heuristic(mine, theirs, geometry):
+    """
+    Scores a position for the side owning mine: every line still open
+    to only one side counts for that side, more the fuller it is.
+    """
+    score = 0
+    for line in geometry.lines:
+        if theirs & line == 0:
+            score += _WEIGHTS[popcount(mine & line)]
+        elif mine & line == 0:
+            score -= _WEIGHTS[popcount(theirs & line)]
+    return score
+
+
+# Line weight by number of marks in it
+_WEIGHTS = [0] + [4 ** count for count in range(1, 32)]
+
+
+def deepening(position, geometry, time_budget=1.0, heuristic=None, max_depth=None,
+              stop=None, stats=None):
+    """
+    Returns an action (i, j) for the player to move, found by iterative
+    deepening: depth-limited alpha-beta searches of growing depth, each
+    ordered by the previous one, until time_budget seconds run out or a
+    search reaches every end of the game. The answer of the deepest
+    finished search is returned; depth 1 always finishes. Setting the
+    stop event ends the search early in the same way.
+    heuristic(mine, theirs, geometry) scores positions at the depth limit
+    for the side owning mine (line_heuristic by default).
+    If stats is a dict, the nodes, cache_hits, cutoffs and max_depth (of
+    the deepest finished search) of all the searches are added to it.
+    """
+    if terminal(position, geometry):
+        return None
+    search = _Deepening(geometry, heuristic or line_heuristic,
+                        time.perf_counter() + time_budget, stop)
+    mine, theirs = position if player(position) == ttt.X else position[::-1]
+    best_cell = None
+    depth = 1
+    finished = 0
+    empty = popcount(geometry.full & ~(mine | theirs))
+    while max_depth is None or depth <= max_depth:
+        search.cut = False
+        try:
+            best_cell = search.root(mine, theirs, depth, best_cell)
+        except Timeout:
+            break
+        finished = depth
+        if not search.cut or depth >= empty:
+            break  # Searched to the end of the game
+        depth += 1
+        search.checked = True
+    if stats is not None:
+        search.report(stats, finished)
+    return divmod(best_cell, geometry.cols)
+
+
+class _Deepening():
+    """
+    State shared by the searches of one deepening call.
+    """
+
+    def __init__(self, geometry, heuristic, deadline, stop=None):
+        self.geometry = geometry
+        self.heuristic = heuristic
+        self.deadline = deadline
+        self.stop = stop
+        self.table = {}  # (mine, theirs) -> (depth, value, flag, best cell)
+        self.nodes = 0
+        self.hits = 0  # Transposition table entries that ended a search
+        self.cutoffs = 0
+        self.cut = False  # Whether the depth limit cut any line of play
+        self.checked = False  # Depth 1 runs without checking the clock
+
+    def report(self, stats, depth):
+        """
+        Adds the work done so far to a stats dict, with depth as max_depth.
+        """
+        stats["nodes"] = stats.get("nodes", 0) + self.nodes
+        stats["cache_hits"] = stats.get("cache_hits", 0) + self.hits
+        stats["cutoffs"] = stats.get("cutoffs", 0) + self.cutoffs
+        stats["max_depth"] = max(stats.get("max_depth", 0), depth)
+
+    def root(self, mine, theirs, depth, first):
+        """
+        Returns the best cell at this depth, trying first before the rest.
+        """
+        geometry = self.geometry
+        moves = geometry.moves(mine | theirs)
+        cells = [cell for cell in geometry.order if moves >> cell & 1]
+        if first is not None:
+            cells.remove(first)
+            cells.insert(0, first)
+        stones = popcount(mine | theirs) + 1
+        best_score = -math.inf
+        best_cell = cells[0]
+        for cell in cells:
+            score = -self.negamax(theirs, mine | 1 << cell, depth - 1, -math.inf, -best_score,
+                                  cell, stones)
+            if score > best_score:
+                best_score = score
+                best_cell = cell
+        return best_cell
+
+    def negamax(self, mine, theirs, depth, alpha, beta, last, stones):
+        """
+        Returns the value of a position for the side owning mine, which is
+        to move, searching depth more moves. theirs has just played cell
+        last and stones counts the marks on the board.
+        """
+        self.nodes += 1
+        if self.checked and self.nodes & 63 == 0 and (
+                time.perf_counter() > self.deadline
+                or self.stop is not None and self.stop.is_set()):
+            raise Timeout
+
+        geometry = self.geometry
+        for line in geometry.through[last]:
+            if theirs & line == line:
+                return -(WIN - stones)  # Losing later is better than sooner
+        if stones == geometry.cells:
+            return 0
+        taken = mine | theirs
+        if depth == 0:
+            self.cut = True
+            return self.heuristic(mine, theirs, geometry)
+
+        key = (mine, theirs)
+        first = None
+        if key in self.table:
+            stored_depth, value, flag, first = self.table[key]
+            if stored_depth >= depth:
+                if flag == ttt.EXACT:
+                    self.hits += 1
+                    return value
+                if flag == ttt.LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    self.hits += 1
+                    return value
+
+        moves = geometry.moves(taken)
+        cells = [cell for cell in geometry.order if moves >> cell & 1]
+        if first is not None and first in cells:
+            cells.remove(first)
+            cells.insert(0, first)
+
+        window = (alpha, beta)
+        value = -math.inf
+        best_cell = None
+        for cell in cells:
+            score = -self.negamax(theirs, mine | 1 << cell, depth - 1, -beta, -alpha,
+                                  cell, stones + 1)
+            if score > value:
+                value = score
+                best_cell = cell
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                self.cutoffs += 1
+                break
+        self.table[key] = (depth, value, ttt.bound(value, *window), best_cell)
+        return value
+
+
+def minimax(board):
+    """
+    Drop-in replacement for tictactoe.minimax on list-of-lists boards
+    small enough to solve exactly.
+    """
+    geometry = geometry_for(board)
+    return best_move(from_board(board, geometry), geometry)
@@ -0,0 +1,218 @@
+"""
+Monte Carlo Tree Search for Tic Tac Toe boards too big for minimax.
+
+mcts.minimax(board) answers like tictactoe.minimax(board). Positions are
+(x, o) bitboards from bitboard.py. Each playout walks down the tree
+choosing children by UCT (upper confidence bound for trees), adds one new
+child, then plays random moves to the end of the game and credits the
+result to every node on the way. The most visited root move is played.
+
+The tree is kept between calls: when the next board is a position the
+tree already reached (usually the opponent's reply to our last move),
+that subtree becomes the new root and its playouts are not lost.
+
+Usage: python mcts.py [rows cols [k]] to time one move on an empty board.
+"""
+
+import math
+import random
+import sys
+import time
+
+import bitboard
+import tictactoe as ttt
+
+# Exploration weight of UCT
+EXPLORATION = math.sqrt(2)
+
+# Playouts between clock and stop checks
+CHECK_EVERY = 64
+
+# Statistics of the last call
+stats = {"playouts": 0, "seconds": 0.0, "playouts_per_second": 0.0, "reused": 0,
+         "max_depth": 0}
+
+# Root of the tree kept for the next call, and its geometry
+_root = None
+_root_geometry = None
+
+
+class Node():
+    """
+    A position in the search tree. wins counts the playouts won, plus half
+    the drawn ones, by the player who made the move leading here.
+    """
+
+    def __init__(self, mine, theirs, last, parent=None):
+        self.mine = mine  # Marks of the player to move
+        self.theirs = theirs  # Marks of the player who just moved
+        self.last = last  # Cell just played, or None at the start
+        self.parent = parent
+        self.children = {}  # cell -> Node
+        self.untried = None  # Cells not expanded yet, filled on first visit
+        self.visits = 0
+        self.wins = 0.0
+        self.result = None  # 1 if the player who just moved won, 0.5 for a draw
+
+    def select(self):
+        """
+        Returns the child with the highest upper confidence bound.
+        """
+        log_visits = math.log(self.visits)
+        best_score = -math.inf
+        best_child = None
+        for child in self.children.values():
+            score = (child.wins / child.visits
+                     + EXPLORATION * math.sqrt(log_visits / child.visits))
+            if score > best_score:
+                best_score = score
+                best_child = child
+        return best_child
+
+
+def _evaluate(node, geometry):
+    """
+    Sets node.result if the game is over at node.
+    """
+    if node.last is not None:
+        for line in geometry.through[node.last]:
+            if node.theirs & line == line:
+                node.result = 1
+                return
+    if (node.mine | node.theirs) == geometry.full:
+        node.result = 0.5
+
+
+def playout(mine, theirs, geometry, rng=random):
+    """
+    Plays random moves from a position to the end of the game. Returns 1
+    if the player to move (owning mine) wins, 0 if they lose, 0.5 for a draw.
+    """
+    empty = geometry.full & ~(mine | theirs)
+    cells = [cell for cell in range(geometry.cells) if empty >> cell & 1]
+    rng.shuffle(cells)
+    through = geometry.through
+    to_move = 0
+    marks = [mine, theirs]
+    for cell in cells:
+        marks[to_move] |= 1 << cell
+        own = marks[to_move]
+        for line in through[cell]:
+            if own & line == line:
+                return 1 if to_move == 0 else 0
+        to_move ^= 1
+    return 0.5
+
+
+def _step(root, geometry, rng):
+    """
+    Runs one playout from root and backs its result up the tree.
+    Returns the depth in the tree the playout started from.
+    """
+    node = root
+    depth = 0
+    while node.result is None and not node.untried and node.children:
+        node = node.select()
+        depth += 1
+
+    if node.result is None:
+        if node.untried is None:
+            moves = geometry.moves(node.mine | node.theirs)
+            node.untried = [cell for cell in geometry.order if moves >> cell & 1]
+            rng.shuffle(node.untried)
+        if node.untried:
+            cell = node.untried.pop()
+            child = Node(node.theirs, node.mine | 1 << cell, cell, node)
+            _evaluate(child, geometry)
+            node.children[cell] = child
+            node = child
+            depth += 1
+
+    if node.result is not None:
+        score = node.result
+    else:
+        score = 1 - playout(node.mine, node.theirs, geometry, rng)
+
+    # score is for the player who moved into node; flip it on the way up
+    while node is not None:
+        node.visits += 1
+        node.wins += score
+        score = 1 - score
+        node = node.parent
+    return depth
+
+
+def _find(root, mine, theirs, depth=2):
+    """
+    Returns the node of the tree under root for a position at most depth
+    moves later, or None.
+    """
+    if root.mine == mine and root.theirs == theirs:
+        return root
+    if depth == 0:
+        return None
+    for child in root.children.values():
+        found = _find(child, mine, theirs, depth - 1)
+        if found is not None:
+            return found
+    return None
+
+
+def minimax(board, playouts=None, time_budget=None, stop=None, rng=random):
+    """
+    Returns an action (i, j) for the player to move on board, after
+    playouts playouts or time_budget seconds, whichever comes first
+    (tictactoe.TIME_BUDGET seconds if neither is given), or once the stop
+    event is set. Statistics of the search are left in stats.
+    """
+    global _root, _root_geometry
+    if ttt.terminal(board):
+        return None
+    if playouts is None and time_budget is None:
+        time_budget = ttt.TIME_BUDGET
+    start = time.perf_counter()
+    deadline = start + time_budget if time_budget is not None else math.inf
+
+    geometry = bitboard.geometry_for(board)
+    x, o = bitboard.from_board(board, geometry)
+    mine, theirs = (x, o) if bitboard.player((x, o)) == ttt.X else (o, x)
+
+    root = None
+    if _root is not None and _root_geometry is geometry:
+        root = _find(_root, mine, theirs)
+    if root is None:
+        root = Node(mine, theirs, None)
+    root.parent = None
+    stats["reused"] = root.visits
+
+    count = 0
+    max_depth = 0
+    while playouts is None or count < playouts:
+        if count % CHECK_EVERY == 0 and (time.perf_counter() > deadline
+                                         or stop is not None and stop.is_set()):
+            break
+        max_depth = max(max_depth, _step(root, geometry, rng))
+        count += 1
+    if not root.children:
+        max_depth = max(max_depth, _step(root, geometry, rng))
+        count += 1
+
+    seconds = time.perf_counter() - start
+    stats["playouts"] = count
+    stats["seconds"] = seconds
+    stats["playouts_per_second"] = count / seconds if seconds else 0.0
+    stats["max_depth"] = max_depth
+
+    cell = max(root.children, key=lambda cell: root.children[cell].visits)
+    _root = root.children[cell]
+    _root_geometry = geometry
+    return divmod(cell, geometry.cols)
+
+
+if __name__ == "__main__":
+    shape = [int(arg) for arg in sys.argv[1:4]]
+    rows, cols = shape[:2] if len(shape) >= 2 else (15, 15)
+    k = shape[2] if len(shape) == 3 else None
+    move = minimax(ttt.initial_state(rows, cols, k))
+    print(f"Move {move}: {stats['playouts']} playouts in {stats['seconds']:.2f}s "
+          f"({stats['playouts_per_second']:.0f} per second)")
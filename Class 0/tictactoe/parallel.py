@@ -0,0 +1,207 @@
+"""
+Root-split parallel search for big Tic Tac Toe boards.
+
+Each depth of the iterative deepening in bitboard.deepening is split by
+root move across a pool of worker processes. The best move of the
+previous depth is searched first, on its own, to get a good bound; the
+remaining moves are then searched in parallel. Workers share the best
+root score found so far (alpha) through a multiprocessing.Value and read
+it before every move they search, so a strong move found by one worker
+narrows the windows of the others. Each worker keeps its transposition
+table for the whole decision, so deeper searches are ordered by the
+shallower ones like in the single-process search.
+"""
+
+import math
+import multiprocessing
+import time
+
+import bitboard
+import tictactoe as ttt
+
+# How often the main process checks the stop event while waiting, in seconds
+POLL = 0.05
+
+# Workers are started fresh rather than forked: the pool is usually created
+# from runner.py's search thread while pygame's threads are running, and
+# forking a multi-threaded process can deadlock the child
+_context = multiprocessing.get_context("spawn")
+
+# Pool shared by every call with the same number of workers
+_pool = None
+_pool_workers = 0
+_decisions = 0
+_alpha = None
+_abort = None
+
+# Worker process state
+_worker_alpha = None
+_worker_abort = None
+_worker_search = None
+_worker_decision = None
+
+
+def _initialize(alpha, abort):
+    global _worker_alpha, _worker_abort
+    _worker_alpha = alpha
+    _worker_abort = abort
+
+
+def pool(workers):
+    """
+    Returns the pool of worker processes, starting it on first use.
+    """
+    global _pool, _pool_workers, _alpha, _abort
+    if _pool is None or _pool_workers != workers:
+        shutdown()
+        _alpha = _context.Value("d", -math.inf)
+        _abort = _context.Event()
+        _pool = _context.Pool(workers, _initialize, (_alpha, _abort))
+        _pool_workers = workers
+    return _pool
+
+
+def shutdown():
+    """
+    Stops the worker processes, if they were started.
+    """
+    global _pool
+    if _pool is not None:
+        _pool.terminate()
+        _pool.join()
+        _pool = None
+
+
+def _search_move(task):
+    """
+    Worker side: returns (cell, score, cut, exact, work) for one root
+    move searched to depth. score is None if the deadline passed or the
+    search was aborted, and only an upper bound when exact is False,
+    because the move could not beat the shared alpha. work is the
+    (nodes, cache hits, cutoffs) the search took.
+    """
+    global _worker_search, _worker_decision
+    decision, shape, mine, theirs, cell, depth, stones, deadline, heuristic = task
+    if _worker_abort.is_set() or time.time() > deadline:
+        return cell, None, False, False, (0, 0, 0)
+    if _worker_decision != decision:
+        geometry = geometry_for(*shape)
+        _worker_search = bitboard._Deepening(geometry, heuristic or bitboard.line_heuristic,
+                                             0, _worker_abort)
+        _worker_search.checked = True
+        _worker_decision = decision
+    search = _worker_search
+    # deadline is wall clock time, which unlike perf_counter all processes share
+    search.deadline = time.perf_counter() + deadline - time.time()
+    search.cut = False
+    before = (search.nodes, search.hits, search.cutoffs)
+
+    with _worker_alpha.get_lock():
+        alpha = _worker_alpha.value
+    try:
+        score = -search.negamax(theirs, mine | 1 << cell, depth - 1, -math.inf, -alpha,
+                                cell, stones)
+    except bitboard.Timeout:
+        score = None
+    work = (search.nodes - before[0], search.hits - before[1], search.cutoffs - before[2])
+    if score is None:
+        return cell, None, False, False, work
+    with _worker_alpha.get_lock():
+        if score > _worker_alpha.value:
+            _worker_alpha.value = score
+    return cell, score, search.cut, score > alpha, work
+
+
+def geometry_for(rows, cols, k):
+    """
+    Returns the bitboard Geometry for a rows x cols board with k in a row.
+    """
+    key = (rows, cols, k)
+    if key not in bitboard._geometries:
+        bitboard._geometries[key] = bitboard.Geometry(rows, cols, k)
+    return bitboard._geometries[key]
+
+
+def deepening(position, geometry, time_budget=1.0, heuristic=None, workers=2,
+              max_depth=None, stop=None, stats=None):
+    """
+    Same as bitboard.deepening, searching the root moves of every depth
+    across workers processes. heuristic has to be a module-level function
+    so it can be sent to the workers. stats counts the work of every
+    process.
+    """
+    global _decisions
+    if bitboard.terminal(position, geometry):
+        return None
+    deadline = time.time() + time_budget
+    mine, theirs = position if bitboard.player(position) == ttt.X else position[::-1]
+    moves = geometry.moves(mine | theirs)
+    cells = [cell for cell in geometry.order if moves >> cell & 1]
+    stones = bitboard.popcount(mine | theirs) + 1
+    empty = bitboard.popcount(geometry.full & ~(mine | theirs))
+    shape = (geometry.rows, geometry.cols, geometry.k)
+
+    # Depth 1 always finishes, and is cheap enough to run here
+    search = bitboard._Deepening(geometry, heuristic or bitboard.line_heuristic, math.inf)
+    best_cell = search.root(mine, theirs, 1, None)
+    finished = 1
+    if not search.cut or len(cells) == 1:
+        if stats is not None:
+            search.report(stats, finished)
+        return divmod(best_cell, geometry.cols)
+
+    workers_pool = pool(workers)
+    _abort.clear()
+    _decisions += 1
+    depth = 2
+    while (max_depth is None or depth <= max_depth) and depth <= empty:
+        cells.remove(best_cell)
+        cells.insert(0, best_cell)
+        _alpha.value = -math.inf
+        tasks = [(_decisions, shape, mine, theirs, cell, depth, stones, deadline, heuristic)
+                 for cell in cells]
+
+        # Young brothers wait: the expected best move sets alpha first
+        results = _collect([workers_pool.apply_async(_search_move, (tasks[0],))], stop)
+        if results[0][1] is not None:
+            results += _collect(
+                [workers_pool.apply_async(_search_move, (task,)) for task in tasks[1:]], stop)
+        for result in results:
+            search.nodes += result[4][0]
+            search.hits += result[4][1]
+            search.cutoffs += result[4][2]
+        if any(result[1] is None for result in results):
+            break  # Out of time, keep the last finished depth
+
+        # Highest score, earliest in the order on ties like the serial search
+        best_cell, best_score = results[0][:2]
+        for cell, score, _, exact, _ in results[1:]:
+            if exact and score > best_score:
+                best_score = score
+                best_cell = cell
+        finished = depth
+        if not any(result[2] for result in results):
+            break  # Searched to the end of the game
+        depth += 1
+    if stats is not None:
+        search.report(stats, finished)
+    return divmod(best_cell, geometry.cols)
+
+
+def _collect(pending, stop):
+    """
+    Returns the results of pending tasks in order, telling the workers to
+    give up when the stop event is set.
+    """
+    results = []
+    for task in pending:
+        while True:
+            try:
+                results.append(task.get(POLL))
+                break
+            except multiprocessing.TimeoutError:
+                if stop is not None and stop.is_set():
+                    _abort.set()
+        if results[-1][1] is None:
+            _abort.set()  # The deadline passed, stop the other workers too
+    return results
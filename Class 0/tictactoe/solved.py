@@ -0,0 +1,100 @@
+"""
+Solved-game table for 3x3 Tic Tac Toe.
+
+Run "python solved.py" once to solve every reachable position and write
+solved.bin next to this file. tictactoe.minimax then answers 3x3 boards
+by looking them up, and falls back to searching when the table is missing.
+
+Each board is numbered in base 3 (EMPTY = 0, X = 1, O = 2, cells in
+row-major order), and the table holds one byte per number: the value of
+the position plus one in the high nibble and the best cell in the low
+nibble, or UNSOLVED for terminal and unreachable boards.
+"""
+
+import os
+
+import tictactoe as ttt
+
+MAGIC = b"TTTSOLV1"
+FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "solved.bin")
+POSITIONS = 3 ** 9
+UNSOLVED = 0xFF
+
+# Loaded table, or False once loading has failed
+_table = None
+
+
+def index(board):
+    """
+    Returns the base-3 number of a 3x3 board.
+    """
+    number = 0
+    for row in board:
+        for cell in row:
+            number = number * 3 + (1 if cell == ttt.X else 2 if cell == ttt.O else 0)
+    return number
+
+
+def build(path=FILENAME):
+    """
+    Solves every position reachable from the empty board with
+    tictactoe.search and writes the table to path.
+    Returns how many positions were solved.
+    """
+    table = bytearray([UNSOLVED]) * POSITIONS
+    seen = set()
+    stack = [ttt.initial_state()]
+    while stack:
+        board = stack.pop()
+        number = index(board)
+        if number in seen or ttt.terminal(board):
+            continue
+        seen.add(number)
+
+        i, j = ttt.search(board)
+        value = ttt.value(ttt.result(board, (i, j)))
+        table[number] = (value + 1) << 4 | (i * 3 + j)
+        for action in ttt.actions(board):
+            stack.append(ttt.result(board, action))
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(table)
+    return len(seen)
+
+
+def load(path=FILENAME):
+    """
+    Returns the table, reading it on first use, or None if it is missing.
+    """
+    global _table
+    if _table is None:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            if data[:len(MAGIC)] != MAGIC or len(data) != len(MAGIC) + POSITIONS:
+                raise ValueError("not a solved table")
+            _table = data[len(MAGIC):]
+        except (OSError, ValueError):
+            _table = False
+    return _table or None
+
+
+def lookup(board):
+    """
+    Returns (value, (i, j)) for a solved 3x3 board, or None
+    if there is no table or the board is not in it.
+    """
+    table = load()
+    if table is None:
+        return None
+    entry = table[index(board)]
+    if entry == UNSOLVED:
+        return None
+    cell = entry & 0xF
+    return (entry >> 4) - 1, (cell // 3, cell % 3)
+
+
+if __name__ == "__main__":
+    count = build()
+    print(f"Solved {count} positions into {FILENAME}")
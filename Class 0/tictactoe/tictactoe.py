@@ -2,20 +2,95 @@
 Tic Tac Toe Player
 """
 
+import copy
 import math
+import time
+from collections import OrderedDict
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Transposition table: canonical board key -> (value, flag),
+# least recently used first
+transpositions = OrderedDict()
+TABLE_SIZE = 100000
+table_stats = {"hits": 0, "misses": 0, "evictions": 0}
 
-def initial_state():
+# Flags telling whether a cached value is exact or only a bound
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Move ordering hints: ply -> moves that caused cutoffs there,
+# and action -> cutoff score
+killers = {}
+history = {}
+
+# Board size -> cell permutations for each symmetry of the board
+_symmetries = {}
+
+# Work done by the last minimax decision (see reset_stats)
+search_stats = {}
+
+# Marks on the board search started from, to measure depth below it
+_root_marks = 0
+
+# Row, column, diagonal and anti-diagonal steps
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+# Seconds the AI may think per move on boards too big to solve exactly
+TIME_BUDGET = 1.0
+
+# Processes searching those boards; more than one splits the root moves
+WORKERS = 1
+
+
+class Cancelled(Exception):
     """
-    Returns starting state of the board.
+    Raised inside the search when its stop event is set.
     """
-    return [[EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY]]
+
+
+class Board(list):
+    """
+    A list-of-lists board that also remembers how many marks in a row
+    win, for boards other than the classic 3x3.
+    """
+
+    def __init__(self, rows, k):
+        super().__init__(rows)
+        self.k = k
+
+
+def initial_state(rows=3, cols=3, k=None):
+    """
+    Returns starting state of the board: rows x cols empty cells,
+    won by k in a row (by default 3 on the classic board,
+    the smaller side up to 5 on others).
+    """
+    if k is None:
+        k = min(rows, cols, 5)
+    return Board([[EMPTY] * cols for _ in range(rows)], k)
+
+
+def win_length(board):
+    """
+    Returns how many marks in a row win on the board.
+    Plain lists of lists get the initial_state default.
+    """
+    k = getattr(board, "k", None)
+    if k is None:
+        k = min(len(board), len(board[0]), 5)
+    return k
+
+
+def is_classic(board):
+    """
+    Returns True for the 3x3, three-in-a-row game.
+    """
+    return (len(board) == 3 and all(len(row) == 3 for row in board)
+            and win_length(board) == 3)
 
 
 def player(board):
@@ -55,10 +130,10 @@ def result(board, action):
     Returns the board that results from making move (i, j) on the board.
     """
     # I check that it's within the limits 
-    if((action[0] >2) or (action[0] <0) or (action[1] <0) or (action[1] >2)): 
+    if((action[0] >= len(board)) or (action[0] <0) or (action[1] <0) or (action[1] >= len(board[0]))): 
         raise ValueError("Action Action outside the board limits.")
     
-    aux_board = board
+    aux_board = copy.deepcopy(board)
     poss_actions = actions(board)
     turn = player(board)
     if(action in poss_actions):
@@ -73,45 +148,87 @@ def winner(board):
     """
     Returns the winner of the game, if there is one.
     """
-    winner = None
-    # Horizontally winner? 
-    for i in range(len(board)):
-        if((board[i][0] != EMPTY) and (board[i][0] == board[i][1]) and (board[i][1] == board[i][2]) ):
-            winner = board[i][0]
-
-    # Vertically winner? 
-    for i in range(len(board)):
-        if((board[0][i] != EMPTY) and (board[0][i] == board[1][i]) and (board[1][i] == board[2][i]) ):
-            winner = board[0][i]
-    
-    # Diagonally winner? 
-    values1 = [board[0][0], board[1][1], board[2][2]]
-    values2 = [board[0][2], board[1][1], board[2][0]]
-    
-    if((values1[0] != EMPTY) and values1[0] == values1[1] and values1[1] ==  values1[2]):
-        winner = values1[0]
-    elif ((values2[0] != EMPTY) and values2[0] == values2[1] and values2[1] ==  values2[2]):
-        winner = values2[0]
-        
-    return winner
+    k = win_length(board)
+    rows, cols = len(board), len(board[0])
+    for i in range(rows):
+        for j in range(cols):
+            mark = board[i][j]
+            if mark == EMPTY:
+                continue
+            # Horizontally, vertically or diagonally winner?
+            for di, dj in DIRECTIONS:
+                end_i, end_j = i + di * (k - 1), j + dj * (k - 1)
+                if not (0 <= end_i < rows and 0 <= end_j < cols):
+                    continue
+                if all(board[i + di * step][j + dj * step] == mark for step in range(1, k)):
+                    return mark
+    return None
 
 
 def terminal(board):
     """
     Returns True if game is over, False otherwise.
     """
-    terminal =  True
-    winners = winner(board)
-    
-    if(winners == None):
-        terminal = False
+    if(winner(board) != None):
+        return True
         
     for i in range(len(board)):
         for j in range(len(board[i])):
             if(board[i][j] == EMPTY):
-                terminal = False
+                return False
     
-    return terminal
+    return True
+
+
+def marks(board):
+    """
+    Returns how many moves have been played on the board.
+    """
+    return sum(cell != EMPTY for row in board for cell in row)
+
+
+def winner_at(board, action):
+    """
+    Returns the mark at action if it is part of k in a row, else None.
+    Only the lines through action are checked, so this is O(k).
+    """
+    i, j = action
+    mark = board[i][j]
+    if mark == EMPTY:
+        return None
+    k = win_length(board)
+    rows, cols = len(board), len(board[0])
+    for di, dj in DIRECTIONS:
+        run = 1
+        for sign in (1, -1):
+            step = 1
+            while run < k:
+                ni, nj = i + sign * di * step, j + sign * dj * step
+                if not (0 <= ni < rows and 0 <= nj < cols) or board[ni][nj] != mark:
+                    break
+                run += 1
+                step += 1
+        if run >= k:
+            return mark
+    return None
+
+
+def outcome(board, last=None, moves=None):
+    """
+    Returns the utility of the board if the game is over, None otherwise.
+
+    Given the last action played and the number of marks on the board,
+    only that action can have completed a line, so this is O(k) instead
+    of a scan of the whole board.
+    """
+    if last is None or moves is None:
+        return utility(board) if terminal(board) else None
+    mark = winner_at(board, last)
+    if mark is not None:
+        return 1 if mark == X else -1
+    if moves == len(board) * len(board[0]):
+        return 0
+    return None
 
 
 def utility(board):
@@ -127,50 +244,337 @@ def utility(board):
         return -1
 
 
-def minimax(board):
+def minimax(board, time_budget=None, heuristic=None, stop=None, workers=None,
+            callback=None):
     """
     Returns the optimal action for the current player on the board.
+
+    The classic board is solved exactly. Other boards are searched by
+    iterative deepening on bitboards until time_budget seconds (default
+    TIME_BUDGET) run out or the stop event (a threading.Event) is set,
+    scoring unfinished positions with heuristic (see
+    bitboard.line_heuristic). Returns None if the stop event ends the
+    search of the classic board before it is solved. With more than one
+    worker (default WORKERS) the root moves are split across that many
+    processes (see parallel.py).
+
+    Afterwards search_stats describes the work the decision took, and
+    callback, if given, is called with a copy of it.
     """
     if(terminal(board) == True):
         return None
+
+    reset_stats()
+    start = time.perf_counter()
+    action = _decide(board, time_budget, heuristic, stop, workers)
+    search_stats["seconds"] = time.perf_counter() - start
+    if callback is not None:
+        callback(dict(search_stats))
+    return action
+
+
+def _decide(board, time_budget, heuristic, stop, workers):
+    """
+    Picks the engine for minimax and returns its action.
+    """
+    if is_classic(board):
+        # Answered from the solved table when it was built
+        import solved
+        entry = solved.lookup(board)
+        if entry is not None:
+            search_stats["engine"] = "solved"
+            search_stats["cache_hits"] = 1
+            return entry[1]
+        search_stats["engine"] = "alphabeta"
+        try:
+            return search(board, stop)
+        except Cancelled:
+            return None
+
+    import bitboard
+    if time_budget is None:
+        time_budget = TIME_BUDGET
+    if workers is None:
+        workers = WORKERS
+    geometry = bitboard.geometry_for(board)
+    if workers > 1:
+        import parallel
+        search_stats["engine"] = "parallel"
+        return parallel.deepening(bitboard.from_board(board, geometry), geometry,
+                                  time_budget, heuristic, workers, stop=stop,
+                                  stats=search_stats)
+    search_stats["engine"] = "deepening"
+    return bitboard.deepening(bitboard.from_board(board, geometry), geometry,
+                              time_budget, heuristic, stop=stop, stats=search_stats)
+
+
+def reset_stats():
+    """
+    Zeroes search_stats: the engine used, the nodes visited, the
+    transposition table hits, the alpha-beta cutoffs, the maximum depth
+    searched below the board in moves, and the wall time in seconds.
+    """
+    search_stats.update(engine=None, nodes=0, cache_hits=0, cutoffs=0, max_depth=0,
+                        seconds=0.0)
+
+
+reset_stats()
+
+
+def search(board, stop=None):
+    """
+    Returns the optimal action for the current player on the board,
+    always searching the game tree. Counts its work in search_stats.
+    Raises Cancelled as soon as the stop event (a threading.Event) is set.
+    """
+    global _root_marks
+    if(terminal(board) == True):
+        return None
     
+    # Move ordering hints only apply to the current decision
+    killers.clear()
+    history.clear()
     current_player = player(board)
+    moves = marks(board)
+    _root_marks = moves
+    hits = table_stats["hits"]
     
     if(current_player == X):  # Maximizes x's victory 
         best_score = - math.inf
         best_move = None
-        for action in actions(board):
+        for action in ordered_actions(board, moves):
             new_board = result(board, action)
-            new_score = min_value(new_board)
+            new_score = min_value(new_board, best_score, math.inf, action, moves + 1, stop)
             if (new_score > best_score):
                 best_score = new_score
                 best_move = action
-        return best_move
     else: # Maximizes O's victory
         best_score = math.inf
         best_move = None
-        for action in actions(board):
+        for action in ordered_actions(board, moves):
             new_board = result(board, action)
-            new_score = max_value(new_board)
+            new_score = max_value(new_board, -math.inf, best_score, action, moves + 1, stop)
             if (new_score < best_score):
                 best_score = new_score
                 best_move = action
-        return best_move
+    search_stats["cache_hits"] += table_stats["hits"] - hits
+    return best_move
         
-def max_value(board):
-    if terminal(board):
-        return utility(board)
+def value(board):
+    """
+    Returns the minimax value of the board: 1 if X wins with best play,
+    -1 if O does, 0 for a draw.
+    """
+    if player(board) == X:
+        return max_value(board)
+    return min_value(board)
+
+
+def max_value(board, alpha=-math.inf, beta=math.inf, last=None, moves=None, stop=None):
+    """
+    Returns the value of the board for MAX (X) to move, searched with the
+    window (alpha, beta). last is the action that led to the board and
+    moves the number of marks on it; when given, the game-over check
+    only looks at lines through last. Raises Cancelled once stop is set.
+    """
+    if stop is not None and stop.is_set():
+        raise Cancelled
+    if moves is None:
+        moves = marks(board)
+    search_stats["nodes"] += 1
+    if moves - _root_marks > search_stats["max_depth"]:
+        search_stats["max_depth"] = moves - _root_marks
+    key = canonical(board)
+    entry = lookup(key)
+    if entry is not None:
+        value, flag = entry
+        if flag == EXACT:
+            return value
+        if flag == LOWER:
+            alpha = max(alpha, value)
+        else:
+            beta = min(beta, value)
+        if alpha >= beta:
+            return value
+    over = outcome(board, last, moves)
+    if over is not None:
+        return store(key, over, EXACT)
+    window = (alpha, beta)
     value = -math.inf
-    for action in actions(board):
+    for action in ordered_actions(board, moves):
         new_board = result(board, action)
-        value = max(value, min_value(new_board))
-    return value
+        value = max(value, min_value(new_board, alpha, beta, action, moves + 1, stop))
+        alpha = max(alpha, value)
+        if alpha >= beta:  # MIN already has something better elsewhere
+            record_cutoff(board, action, moves)
+            break
+    return store(key, value, bound(value, *window))
 
-def min_value(board):
-    if terminal(board):
-        return utility(board)
+def min_value(board, alpha=-math.inf, beta=math.inf, last=None, moves=None, stop=None):
+    """
+    Mirror of max_value for MIN (O) to move.
+    """
+    if stop is not None and stop.is_set():
+        raise Cancelled
+    if moves is None:
+        moves = marks(board)
+    search_stats["nodes"] += 1
+    if moves - _root_marks > search_stats["max_depth"]:
+        search_stats["max_depth"] = moves - _root_marks
+    key = canonical(board)
+    entry = lookup(key)
+    if entry is not None:
+        value, flag = entry
+        if flag == EXACT:
+            return value
+        if flag == LOWER:
+            alpha = max(alpha, value)
+        else:
+            beta = min(beta, value)
+        if alpha >= beta:
+            return value
+    over = outcome(board, last, moves)
+    if over is not None:
+        return store(key, over, EXACT)
+    window = (alpha, beta)
     value = float('inf')
-    for action in actions(board):
+    for action in ordered_actions(board, moves):
         new_board = result(board, action)
-        value = min(value, max_value(new_board))
-    return value
\ No newline at end of file
+        value = min(value, max_value(new_board, alpha, beta, action, moves + 1, stop))
+        beta = min(beta, value)
+        if alpha >= beta:  # MAX already has something better elsewhere
+            record_cutoff(board, action, moves)
+            break
+    return store(key, value, bound(value, *window))
+
+
+def bound(value, alpha, beta):
+    """
+    Returns whether a value searched with the window (alpha, beta)
+    is exact or only an upper or lower bound on the real value.
+    """
+    if value <= alpha:
+        return UPPER
+    if value >= beta:
+        return LOWER
+    return EXACT
+
+
+def ordered_actions(board, ply):
+    """
+    Returns the actions on the board in the order alpha-beta should try
+    them: killer moves for this ply (number of marks on the board), then
+    moves with the best cutoff history, then the center, the corners and
+    finally the edges.
+    """
+    killer = killers.get(ply, ())
+    rows, cols = len(board), len(board[0])
+    return sorted(actions(board), key=lambda action: (
+        action not in killer,
+        -history.get(action, 0),
+        placement(action, rows, cols),
+        action
+    ))
+
+
+def placement(action, rows, cols):
+    """
+    Ranks a cell for move ordering: center cells first, then corners,
+    then the rest, nearer the center first.
+    """
+    i, j = action
+    distance = abs(2 * i - (rows - 1)) + abs(2 * j - (cols - 1))
+    if distance <= 1:
+        return (0, distance)
+    if i in (0, rows - 1) and j in (0, cols - 1):
+        return (1, distance)
+    return (2, distance)
+
+
+def record_cutoff(board, action, ply):
+    """
+    Remembers that action caused a cutoff on the board, as a killer move
+    for its ply and in the history table weighted by the depth left.
+    """
+    search_stats["cutoffs"] += 1
+    empty = len(board) * len(board[0]) - ply
+    killer = killers.setdefault(ply, [])
+    if action not in killer:
+        killer.insert(0, action)
+        del killer[2:]
+    history[action] = history.get(action, 0) + 2 ** empty
+
+
+def symmetries(rows, cols):
+    """
+    Returns, for every rotation and reflection that maps a rows x cols
+    board onto itself, the list of source cells (as flat indexes)
+    in the order they appear in the transformed board.
+    """
+    if (rows, cols) not in _symmetries:
+        transforms = [
+            lambda i, j: (i, j),
+            lambda i, j: (i, cols - 1 - j),
+            lambda i, j: (rows - 1 - i, j),
+            lambda i, j: (rows - 1 - i, cols - 1 - j)
+        ]
+        if rows == cols:
+            transforms += [
+                lambda i, j: (j, i),
+                lambda i, j: (j, cols - 1 - i),
+                lambda i, j: (rows - 1 - j, i),
+                lambda i, j: (rows - 1 - j, cols - 1 - i)
+            ]
+        _symmetries[(rows, cols)] = [
+            [transform(i, j)[0] * cols + transform(i, j)[1]
+             for i in range(rows) for j in range(cols)]
+            for transform in transforms
+        ]
+    return _symmetries[(rows, cols)]
+
+
+def canonical(board):
+    """
+    Returns a key shared by a board and all its rotations and reflections,
+    which have the same minimax value. The shape and the win length are
+    part of the key, since the same cells can be worth different values
+    under different rules.
+    """
+    rows, cols = len(board), len(board[0])
+    cells = "".join(cell or "." for row in board for cell in row)
+    return (rows, cols, win_length(board),
+            min("".join(cells[k] for k in permutation)
+                for permutation in symmetries(rows, cols)))
+
+
+def lookup(key):
+    """
+    Returns the cached (value, flag) for a canonical board key, or None.
+    """
+    entry = transpositions.get(key)
+    if entry is None:
+        table_stats["misses"] += 1
+        return None
+    transpositions.move_to_end(key)
+    table_stats["hits"] += 1
+    return entry
+
+
+def store(key, value, flag):
+    """
+    Caches the value of a canonical board key with its EXACT, LOWER or
+    UPPER flag, evicting the least recently used entry once the table
+    is full. Returns value.
+    """
+    transpositions[key] = (value, flag)
+    if len(transpositions) > TABLE_SIZE:
+        transpositions.popitem(last=False)
+        table_stats["evictions"] += 1
+    return value
+
+
+def cache_stats():
+    """
+    Returns the transposition table counters and current size.
+    """
+    return dict(table_stats, size=len(transpositions))
\ No newline at end of file
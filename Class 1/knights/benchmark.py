@@ -0,0 +1,86 @@
+"""
+Benchmarks model_check on generated knights and knaves puzzles.
+
+Usage: python benchmark.py [--people 3 4 5 6 7] [--seed 0]
+
+For every number of people a puzzle is generated where each person makes
+one random statement about the others, and model_check is asked whether
+each person is a knight three ways: walking the sentence trees,
+evaluating compiled sentences (see logic.compile_sentence) and
+evaluating truth tables (see logic.TruthTable). All three enumerate
+every model, whatever logic.ENUMERATION_LIMIT says.
+"""
+
+import argparse
+import random
+import time
+
+import logic
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+
+def puzzle(people, rng):
+    """
+    Returns (knowledge, knights) for a puzzle with people people, knights
+    being the symbols the queries ask about.
+    """
+    knights = [Symbol(f"{chr(65 + i)} is a Knight") for i in range(people)]
+    knaves = [Symbol(f"{chr(65 + i)} is a Knave") for i in range(people)]
+    knowledge = And()
+    for i in range(people):
+        knowledge.add(Or(knights[i], knaves[i]))
+        knowledge.add(Not(And(knights[i], knaves[i])))
+
+    for i in range(people):
+        others = [j for j in range(people) if j != i] or [i]
+        a, b = rng.choice(others), rng.choice(others)
+        statement = rng.choice([
+            knaves[a],
+            And(knights[a], knaves[b]),
+            Or(knights[a], knights[b]),
+            Biconditional(knights[a], knights[b]),
+            Implication(knights[a], knaves[b])
+        ])
+        knowledge.add(Implication(knights[i], statement))
+        knowledge.add(Implication(knaves[i], Not(statement)))
+    return knowledge, knights
+
+
+def timed(knowledge, knights, vectorize, compiled):
+    """
+    Returns the answers of model_check for every knight and the seconds
+    they took.
+    """
+    logic.VECTORIZE = vectorize
+    logic.COMPILE = compiled
+    start = time.perf_counter()
+    answers = [logic.model_check(knowledge, knight) for knight in knights]
+    return answers, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(usage="python benchmark.py [options]")
+    parser.add_argument("--people", type=int, nargs="+", default=[3, 4, 5, 6, 7])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    settings = logic.ENUMERATION_LIMIT, logic.VECTORIZE, logic.COMPILE
+    logic.ENUMERATION_LIMIT = float("inf")
+    rng = random.Random(args.seed)
+    table = "numpy" if logic.numpy is not None else "int"
+    print(f"{'people':>6} {'symbols':>7} {'models':>8} {'tree (s)':>9} "
+          f"{'compiled (s)':>12} {table + ' table (s)':>15}")
+    for people in args.people:
+        knowledge, knights = puzzle(people, rng)
+        tree_answers, tree_seconds = timed(knowledge, knights, False, False)
+        compiled_answers, compiled_seconds = timed(knowledge, knights, False, True)
+        answers, seconds = timed(knowledge, knights, True, True)
+        if not answers == compiled_answers == tree_answers:
+            raise Exception("the evaluation modes disagree")
+        print(f"{people:>6} {2 * people:>7} {2 ** (2 * people):>8} {tree_seconds:>9.3f} "
+              f"{compiled_seconds:>12.3f} {seconds:>15.3f}")
+    logic.ENUMERATION_LIMIT, logic.VECTORIZE, logic.COMPILE = settings
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,39 @@
 import itertools
+import operator
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Structurally equal sentences are built only once: every sentence except
+# an And() knowledge base is its own key here. Since its parts are shared
+# too, a sentence is equal to another exactly when it has the same class
+# and the very same parts, so hashing and comparing only look one level
+# down. The table keeps sentences for the life of the program, which
+# takes less memory per node than weak references to them would
+_interned = {}
 
 
 class Sentence():
+    __slots__ = ()
+
+    def finish(self):
+        """
+        Returns the sentence built earlier from the same parts, or this
+        newly filled in one after checking its parts are sentences.
+        """
+        node = _interned.get(self)
+        if node is None:
+            for part in self.parts():
+                Sentence.validate(part)
+            node = _interned[self] = self
+        return node
+
+    def parts(self):
+        """Returns the sentences this one is built from."""
+        return ()
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
@@ -11,9 +43,38 @@ class Sentence():
         """Returns string formula representing logical sentence."""
         return ""
 
+    def code(self, slots):
+        """
+        Returns a Python expression evaluating the sentence in a model
+        given as an int m, where bit slots[name] holds the value of name.
+        """
+        raise Exception("nothing to compile")
+
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        return self.walk()[0]
+
+    def walk(self):
+        """
+        Returns the set of symbols in the sentence and a list of the And()
+        knowledge bases inside it, visiting shared parts once.
+        """
+        names = set()
+        knowledge = []
+        seen = set()
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            if isinstance(node, Symbol):
+                names.add(node.name)
+                continue
+            if isinstance(node, And) and node._version is not None and node is not self:
+                knowledge.append(node)
+            stack.extend(node.parts())
+        return names, knowledge
 
     @classmethod
     def validate(cls, sentence):
@@ -42,13 +103,24 @@ class Sentence():
             return f"({s})"
 
 
+def same(parts, others):
+    """Returns whether two lists hold the very same sentences."""
+    return len(parts) == len(others) and all(map(operator.is_, parts, others))
+
+
 class Symbol(Sentence):
+    __slots__ = ("name",)
+
+    def __new__(cls, name):
+        node = object.__new__(cls)
+        node.name = name
+        return node.finish()
 
-    def __init__(self, name):
-        self.name = name
+    def __reduce__(self):
+        return Symbol, (self.name,)
 
     def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
+        return self is other or (isinstance(other, Symbol) and self.name == other.name)
 
     def __hash__(self):
         return hash(("symbol", self.name))
@@ -65,20 +137,35 @@ class Symbol(Sentence):
     def formula(self):
         return self.name
 
+    def code(self, slots):
+        try:
+            return f"(m >> {slots[self.name]} & 1)"
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
+
     def symbols(self):
         return {self.name}
 
 
 class Not(Sentence):
-    def __init__(self, operand):
-        Sentence.validate(operand)
-        self.operand = operand
+    __slots__ = ("operand",)
+
+    def __new__(cls, operand):
+        node = object.__new__(cls)
+        node.operand = operand
+        return node.finish()
+
+    def __reduce__(self):
+        return Not, (self.operand,)
 
     def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+        return self is other or (isinstance(other, Not) and self.operand is other.operand)
 
     def __hash__(self):
-        return hash(("not", hash(self.operand)))
+        return hash(("not", id(self.operand)))
+
+    def parts(self):
+        return (self.operand,)
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -89,23 +176,59 @@ class Not(Sentence):
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
+    def code(self, slots):
+        return f"(not {self.operand.code(slots)})"
 
 
 class And(Sentence):
-    def __init__(self, *conjuncts):
-        for conjunct in conjuncts:
-            Sentence.validate(conjunct)
-        self.conjuncts = list(conjuncts)
+    """
+    Conjunction. And() starts an empty knowledge base to fill with add,
+    which is never shared. An And built from conjuncts is shared by every
+    equal sentence, like the other connectives, so it cannot be added to.
+    """
+    # _version counts the conjuncts added, or is None if the And cannot
+    # change. _symbols caches the symbols of an And queried as a whole,
+    # valid while stamp() is _stamp; _nested lists the knowledge bases
+    # inside it that stamp() has to look at
+    __slots__ = ("conjuncts", "_version", "_nested", "_symbols", "_stamp")
+
+    def __new__(cls, *conjuncts):
+        node = object.__new__(cls)
+        node.conjuncts = list(conjuncts)
+        node._version = None if conjuncts else 0
+        node._nested = None
+        node._symbols = None
+        node._stamp = None
+        if not conjuncts:
+            return node
+        return node.finish()
+
+    def __reduce__(self):
+        if self._version is None:
+            return And, tuple(self.conjuncts)
+        return _knowledge, (list(self.conjuncts),)
 
     def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        return self is other or (isinstance(other, And) and same(self.conjuncts, other.conjuncts))
 
     def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+        return hash(("and", tuple(map(id, self.conjuncts))))
+
+    def parts(self):
+        return self.conjuncts
+
+    def stamp(self):
+        """
+        Returns a number that grows whenever this And or a knowledge base
+        in _nested is added to.
+        """
+        return (self._version or 0) + sum(knowledge._version for knowledge in self._nested or ())
+
+    def symbols(self):
+        if self._symbols is None or self._stamp != self.stamp():
+            self._symbols, self._nested = self.walk()
+            self._stamp = self.stamp()
+        return set(self._symbols)
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -114,8 +237,22 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
+        if self._version is None:
+            raise TypeError("cannot add to an And built from conjuncts, "
+                            "start the knowledge base with And()")
         Sentence.validate(conjunct)
+        current = self._symbols is not None and self._stamp == self.stamp()
         self.conjuncts.append(conjunct)
+        self._version += 1
+        if current:
+            # Only the symbols of the new conjunct are missing
+            names, knowledge = conjunct.walk()
+            if isinstance(conjunct, And) and conjunct._version is not None:
+                knowledge.append(conjunct)
+            self._symbols.update(names)
+            if knowledge:
+                self._nested = (self._nested or []) + knowledge
+            self._stamp = self.stamp()
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
@@ -126,23 +263,41 @@ class And(Sentence):
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def code(self, slots):
+        if not self.conjuncts:
+            return "True"
+        return "(" + " and ".join(conjunct.code(slots) for conjunct in self.conjuncts) + ")"
+
+
+def _knowledge(conjuncts):
+    """
+    Rebuilds an And() knowledge base, for pickle and copy.
+    """
+    knowledge = And()
+    for conjunct in conjuncts:
+        knowledge.add(conjunct)
+    return knowledge
 
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
-        for disjunct in disjuncts:
-            Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
+    __slots__ = ("disjuncts",)
+
+    def __new__(cls, *disjuncts):
+        node = object.__new__(cls)
+        node.disjuncts = list(disjuncts)
+        return node.finish()
+
+    def __reduce__(self):
+        return Or, tuple(self.disjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        return self is other or (isinstance(other, Or) and same(self.disjuncts, other.disjuncts))
 
     def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+        return hash(("or", tuple(map(id, self.disjuncts))))
+
+    def parts(self):
+        return self.disjuncts
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -157,24 +312,34 @@ class Or(Sentence):
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def code(self, slots):
+        if not self.disjuncts:
+            return "False"
+        return "(" + " or ".join(disjunct.code(slots) for disjunct in self.disjuncts) + ")"
 
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
-        Sentence.validate(antecedent)
-        Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
+    __slots__ = ("antecedent", "consequent")
+
+    def __new__(cls, antecedent, consequent):
+        node = object.__new__(cls)
+        node.antecedent = antecedent
+        node.consequent = consequent
+        return node.finish()
+
+    def __reduce__(self):
+        return Implication, (self.antecedent, self.consequent)
 
     def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+        return self is other or (isinstance(other, Implication)
+                                 and self.antecedent is other.antecedent
+                                 and self.consequent is other.consequent)
 
     def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+        return hash(("implies", id(self.antecedent), id(self.consequent)))
+
+    def parts(self):
+        return (self.antecedent, self.consequent)
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -188,24 +353,32 @@ class Implication(Sentence):
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def code(self, slots):
+        return f"(not {self.antecedent.code(slots)} or {self.consequent.code(slots)})"
 
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
-        Sentence.validate(left)
-        Sentence.validate(right)
-        self.left = left
-        self.right = right
+    __slots__ = ("left", "right")
+
+    def __new__(cls, left, right):
+        node = object.__new__(cls)
+        node.left = left
+        node.right = right
+        return node.finish()
+
+    def __reduce__(self):
+        return Biconditional, (self.left, self.right)
 
     def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+        return self is other or (isinstance(other, Biconditional)
+                                 and self.left is other.left
+                                 and self.right is other.right)
 
     def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+        return hash(("biconditional", id(self.left), id(self.right)))
+
+    def parts(self):
+        return (self.left, self.right)
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -221,8 +394,144 @@ class Biconditional(Sentence):
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
+    def code(self, slots):
+        return f"((not {self.left.code(slots)}) == (not {self.right.code(slots)}))"
+
+
+# Above this many symbols, model_check asks a SAT solver (see sat.py)
+# instead of enumerating every model
+ENUMERATION_LIMIT = 20
+
+# Whether model_check evaluates truth tables (see TruthTable), or else
+# compiled sentences, or else walks the sentence trees
+VECTORIZE = True
+COMPILE = True
+
+# Most symbols a TruthTable holds: 2 ** 26 models take 8 MiB per vector
+TRUTH_TABLE_LIMIT = 26
+
+
+class TruthTable():
+    """
+    Every model over a set of symbols at once. Model m gives symbols[i]
+    the value of bit i of m, and a sentence evaluates to a bit vector
+    whose bit m is its value in model m, computed with a few bitwise
+    operations per connective instead of one evaluate call per model.
+    Vectors are numpy uint64 arrays when numpy is installed and Python
+    ints otherwise.
+    """
+
+    def __init__(self, symbols, use_numpy=None):
+        self.symbols = sorted(symbols)
+        if len(self.symbols) > TRUTH_TABLE_LIMIT:
+            raise ValueError(f"at most {TRUTH_TABLE_LIMIT} symbols fit in a truth table")
+        self.size = 2 ** len(self.symbols)
+        self.numpy = numpy is not None if use_numpy is None else use_numpy
+        if self.numpy:
+            self.words = max(1, self.size // 64)
+            self.full = numpy.full(self.words, (1 << min(self.size, 64)) - 1,
+                                   dtype=numpy.uint64)
+        else:
+            self.full = (1 << self.size) - 1
+        self.vectors = {name: self.symbol_vector(i) for i, name in enumerate(self.symbols)}
+
+    def symbol_vector(self, i):
+        """
+        Returns the vector of the models where bit i is set.
+        """
+        if self.numpy and i >= 6:
+            # Whole 64-model words are either all true or all false
+            words = numpy.arange(self.words, dtype=numpy.uint64) >> numpy.uint64(i - 6) & 1
+            return words * numpy.uint64(2 ** 64 - 1)
+        block = 2 ** i
+        pattern = ((1 << block) - 1) << block
+        width = 2 * block
+        while width < min(self.size, 64 if self.numpy else self.size):
+            pattern |= pattern << width
+            width *= 2
+        if self.numpy:
+            return numpy.full(self.words, pattern, dtype=numpy.uint64)
+        return pattern
+
+    def evaluate(self, sentence):
+        """
+        Returns the vector of the models where sentence is true.
+        """
+        if isinstance(sentence, Symbol):
+            try:
+                return self.vectors[sentence.name]
+            except KeyError:
+                raise Exception(f"variable {sentence.name} not in model")
+        if isinstance(sentence, Not):
+            return self.full ^ self.evaluate(sentence.operand)
+        if isinstance(sentence, And):
+            vector = self.full
+            for conjunct in sentence.conjuncts:
+                vector = vector & self.evaluate(conjunct)
+            return vector
+        if isinstance(sentence, Or):
+            vector = self.full ^ self.full
+            for disjunct in sentence.disjuncts:
+                vector = vector | self.evaluate(disjunct)
+            return vector
+        if isinstance(sentence, Implication):
+            return (self.full ^ self.evaluate(sentence.antecedent)
+                    | self.evaluate(sentence.consequent))
+        if isinstance(sentence, Biconditional):
+            return self.full ^ (self.evaluate(sentence.left)
+                                ^ self.evaluate(sentence.right))
+        raise TypeError(f"cannot evaluate {sentence!r}")
+
+    def count(self, vector):
+        """
+        Returns the number of models in a vector.
+        """
+        if not self.numpy:
+            return vector.bit_count()
+        if hasattr(numpy, "bitwise_count"):
+            return int(numpy.bitwise_count(vector).sum())
+        return int(numpy.unpackbits(vector.view(numpy.uint8)).sum())
+
+    def empty(self, vector):
+        if self.numpy:
+            return not vector.any()
+        return vector == 0
+
+    def entails(self, knowledge, query):
+        """
+        Returns whether every model of knowledge is a model of query.
+        """
+        return self.empty(self.evaluate(knowledge) & (self.full ^ self.evaluate(query)))
+
+
+def satisfiable(sentence):
+    """
+    Returns whether some model makes sentence true.
+    """
+    symbols = sentence.symbols()
+    if len(symbols) > ENUMERATION_LIMIT:
+        import sat
+        return sat.satisfiable(sentence) is not None
+    table = TruthTable(symbols)
+    return not table.empty(table.evaluate(sentence))
+
+
+def count_models(sentence):
+    """
+    Returns how many models over the symbols of sentence make it true.
+    """
+    table = TruthTable(sentence.symbols())
+    return table.count(table.evaluate(sentence))
+
+
+def compile_sentence(sentence, symbols):
+    """
+    Compiles a sentence into a function of a model given as an int,
+    where bit i holds the value of symbols[i]. Raises RecursionError or
+    SyntaxError for sentences nested too deeply to compile.
+    """
+    slots = {name: i for i, name in enumerate(symbols)}
+    return eval(f"lambda m: bool({sentence.code(slots)})")
 
 
 def model_check(knowledge, query):
@@ -257,7 +566,22 @@ def model_check(knowledge, query):
                     check_all(knowledge, query, remaining, model_false))
 
     # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+    symbols = knowledge.symbols() | query.symbols()
+
+    # Too many models to enumerate, search for a counterexample instead
+    if len(symbols) > ENUMERATION_LIMIT:
+        import sat
+        return sat.entails(knowledge, query)
 
     # Check that knowledge entails query
+    if VECTORIZE:
+        return TruthTable(symbols).entails(knowledge, query)
+    if COMPILE:
+        try:
+            check = compile_sentence(Implication(knowledge, query), sorted(symbols))
+        except (RecursionError, SyntaxError, MemoryError):
+            check = None
+        if check is not None:
+            # One call per model, each numbered by the bits of its values
+            return all(map(check, range(2 ** len(symbols))))
     return check_all(knowledge, query, symbols, dict())
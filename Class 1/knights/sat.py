@@ -0,0 +1,379 @@
+"""
+SAT-based entailment for logic.py.
+
+A knowledge base KB entails a query exactly when KB ∧ ¬query has no
+model. Instead of enumerating all 2^n models, the sentences are turned
+into clauses (conjunctive normal form) with the Tseitin encoding, which
+gives every compound subsentence a fresh variable so the clauses grow
+linearly with the sentence, and the clauses are handed to a CDCL
+(conflict-driven clause learning) solver: DPLL search with unit
+propagation over two watched literals per clause, learning a clause from
+every conflict and jumping back to where that clause becomes unit.
+
+Literals are non-zero integers: v for variable v, -v for its negation.
+"""
+
+import heapq
+
+from logic import And, Biconditional, Implication, Not, Or, Symbol
+
+
+class CNF():
+    """
+    Clauses over numbered variables, built from Sentences.
+    """
+
+    def __init__(self):
+        self.clauses = []
+        self.variables = {}  # symbol name -> variable
+        self.count = 0
+        self.gates = {}  # id of a compound sentence -> its literal
+        self.sentences = []  # keeps the sentences in gates alive
+        self.true = None  # variable fixed to true, for empty And and Or
+
+    def variable(self):
+        self.count += 1
+        return self.count
+
+    def symbol(self, name):
+        if name not in self.variables:
+            self.variables[name] = self.variable()
+        return self.variables[name]
+
+    def constant(self, value):
+        """
+        Returns a literal that is always value.
+        """
+        if self.true is None:
+            self.true = self.variable()
+            self.clauses.append([self.true])
+        return self.true if value else -self.true
+
+    def add(self, sentence):
+        """
+        Adds clauses requiring sentence to be true.
+        """
+        if isinstance(sentence, And):
+            for conjunct in sentence.conjuncts:
+                self.add(conjunct)
+        elif isinstance(sentence, Or):
+            self.clauses.append([self.literal(disjunct) for disjunct in sentence.disjuncts])
+        elif isinstance(sentence, Implication):
+            self.clauses.append([-self.literal(sentence.antecedent),
+                                 self.literal(sentence.consequent)])
+        elif isinstance(sentence, Not) and isinstance(sentence.operand, Or):
+            for disjunct in sentence.operand.disjuncts:
+                self.clauses.append([-self.literal(disjunct)])
+        elif isinstance(sentence, Not) and isinstance(sentence.operand, Implication):
+            self.clauses.append([self.literal(sentence.operand.antecedent)])
+            self.clauses.append([-self.literal(sentence.operand.consequent)])
+        else:
+            self.clauses.append([self.literal(sentence)])
+
+    def literal(self, sentence):
+        """
+        Returns a literal equivalent to sentence, adding the Tseitin
+        clauses defining it the first time a subsentence is seen.
+        """
+        if isinstance(sentence, Symbol):
+            return self.symbol(sentence.name)
+        if isinstance(sentence, Not):
+            return -self.literal(sentence.operand)
+        if id(sentence) in self.gates:
+            return self.gates[id(sentence)]
+
+        if isinstance(sentence, And):
+            inputs = [self.literal(conjunct) for conjunct in sentence.conjuncts]
+            if not inputs:
+                return self.constant(True)
+            gate = self.variable()
+            for literal in inputs:
+                self.clauses.append([-gate, literal])
+            self.clauses.append([gate] + [-literal for literal in inputs])
+        elif isinstance(sentence, (Or, Implication)):
+            if isinstance(sentence, Or):
+                inputs = [self.literal(disjunct) for disjunct in sentence.disjuncts]
+            else:
+                inputs = [-self.literal(sentence.antecedent),
+                          self.literal(sentence.consequent)]
+            if not inputs:
+                return self.constant(False)
+            gate = self.variable()
+            for literal in inputs:
+                self.clauses.append([gate, -literal])
+            self.clauses.append([-gate] + inputs)
+        elif isinstance(sentence, Biconditional):
+            left = self.literal(sentence.left)
+            right = self.literal(sentence.right)
+            gate = self.variable()
+            self.clauses.append([-gate, -left, right])
+            self.clauses.append([-gate, left, -right])
+            self.clauses.append([gate, left, right])
+            self.clauses.append([gate, -left, -right])
+        else:
+            raise TypeError(f"cannot encode {sentence!r}")
+
+        self.gates[id(sentence)] = gate
+        self.sentences.append(sentence)
+        return gate
+
+
+class Solver():
+    """
+    CDCL solver for clauses over variables 1..count.
+    """
+
+    def __init__(self, clauses, count):
+        self.count = count
+        self.value = [None] * (count + 1)  # variable -> True, False or None
+        self.level = [0] * (count + 1)
+        self.reason = [None] * (count + 1)  # clause that forced the variable
+        self.phase = [False] * (count + 1)  # last value, tried first
+        self.activity = [0.0] * (count + 1)
+        self.bump = 1.0
+        self.order = [(0.0, variable) for variable in range(1, count + 1)]
+        self.trail = []
+        self.limits = []  # trail length at the start of each decision level
+        self.head = 0  # next trail position to propagate
+        self.watches = {}  # literal -> clauses watching it
+        self.clauses = []
+        self.conflicts = 0
+        self.unsatisfiable = False
+
+        for clause in clauses:
+            self.add_clause(clause)
+
+    def literal_value(self, literal):
+        value = self.value[abs(literal)]
+        if value is None:
+            return None
+        return value if literal > 0 else not value
+
+    def add_clause(self, clause):
+        """
+        Adds an input clause at level 0.
+        """
+        clause = list(dict.fromkeys(clause))
+        if any(-literal in clause for literal in clause):
+            return  # Always true
+        clause = [literal for literal in clause if self.literal_value(literal) is not False]
+        if any(self.literal_value(literal) for literal in clause):
+            return
+        if not clause:
+            self.unsatisfiable = True
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            if self.propagate() is not None:
+                self.unsatisfiable = True
+        else:
+            self.watch(clause)
+
+    def watch(self, clause):
+        self.clauses.append(clause)
+        self.watches.setdefault(clause[0], []).append(clause)
+        self.watches.setdefault(clause[1], []).append(clause)
+
+    def assign(self, literal, reason):
+        variable = abs(literal)
+        self.value[variable] = literal > 0
+        self.level[variable] = len(self.limits)
+        self.reason[variable] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Assigns every literal forced by a unit clause. Returns a clause
+        with all its literals false, or None.
+        """
+        value = self.value
+        while self.head < len(self.trail):
+            false = -self.trail[self.head]
+            self.head += 1
+            watching = self.watches.get(false, [])
+            kept = []
+            for position, clause in enumerate(watching):
+                if clause[0] == false:
+                    clause[0], clause[1] = clause[1], clause[0]
+                other = clause[0]
+                other_value = value[abs(other)]
+                if other_value is not None and other_value == (other > 0):
+                    kept.append(clause)
+                    continue
+
+                # Look for another literal that is not false to watch
+                for index in range(2, len(clause)):
+                    literal = clause[index]
+                    literal_value = value[abs(literal)]
+                    if literal_value is None or literal_value == (literal > 0):
+                        clause[1], clause[index] = literal, false
+                        self.watches.setdefault(literal, []).append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if other_value is None:
+                        self.assign(other, clause)
+                    else:
+                        kept.extend(watching[position + 1:])
+                        self.watches[false] = kept
+                        return clause
+            self.watches[false] = kept
+        return None
+
+    def analyze(self, conflict):
+        """
+        Returns the clause learnt from a conflict (its first literal is the
+        one it will force) and the level to jump back to.
+        """
+        seen = set()
+        learnt = [None]
+        pending = 0  # literals of the current level still to resolve
+        current = len(self.limits)
+        index = len(self.trail) - 1
+        clause = conflict
+        literal = None
+        while True:
+            for other in clause:
+                if other == literal:
+                    continue
+                variable = abs(other)
+                if variable in seen or self.level[variable] == 0:
+                    continue
+                seen.add(variable)
+                self.bump_activity(variable)
+                if self.level[variable] == current:
+                    pending += 1
+                else:
+                    learnt.append(other)
+
+            # Walk back to the latest seen literal of this level
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.reason[abs(literal)]
+
+        learnt[0] = -literal
+        level = 0
+        if len(learnt) > 1:
+            deepest = max(range(1, len(learnt)), key=lambda i: self.level[abs(learnt[i])])
+            learnt[1], learnt[deepest] = learnt[deepest], learnt[1]
+            level = self.level[abs(learnt[1])]
+        self.bump *= 1.05
+        return learnt, level
+
+    def bump_activity(self, variable):
+        self.activity[variable] += self.bump
+        if self.activity[variable] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.bump *= 1e-100
+            self.order = [(-self.activity[v], v) for v in range(1, self.count + 1)
+                          if self.value[v] is None]
+            heapq.heapify(self.order)
+        elif self.value[variable] is None:
+            heapq.heappush(self.order, (-self.activity[variable], variable))
+
+    def backjump(self, level):
+        """
+        Undoes every assignment above level.
+        """
+        if len(self.limits) <= level:
+            return
+        start = self.limits[level]
+        for literal in self.trail[start:]:
+            variable = abs(literal)
+            self.phase[variable] = self.value[variable]
+            self.value[variable] = None
+            self.reason[variable] = None
+            heapq.heappush(self.order, (-self.activity[variable], variable))
+        del self.trail[start:]
+        del self.limits[level:]
+        self.head = start
+
+    def decide(self):
+        """
+        Returns the unassigned variable with the highest activity, or None.
+        """
+        while self.order:
+            _, variable = heapq.heappop(self.order)
+            if self.value[variable] is None:
+                return variable
+        return None
+
+    def solve(self):
+        """
+        Returns a satisfying assignment as a list indexed by variable,
+        or None if there is none.
+        """
+        if self.unsatisfiable:
+            return None
+        restart = 100
+        for restarts in range(1 << 30):
+            limit = restart * luby(restarts)
+            conflicts = 0
+            while True:
+                conflict = self.propagate()
+                if conflict is not None:
+                    self.conflicts += 1
+                    conflicts += 1
+                    if not self.limits:
+                        return None
+                    learnt, level = self.analyze(conflict)
+                    self.backjump(level)
+                    if len(learnt) == 1:
+                        self.assign(learnt[0], None)
+                    else:
+                        self.watch(learnt)
+                        self.assign(learnt[0], learnt)
+                    continue
+                if conflicts >= limit:
+                    self.backjump(0)
+                    break
+                variable = self.decide()
+                if variable is None:
+                    return list(self.value)
+                self.limits.append(len(self.trail))
+                self.assign(variable if self.phase[variable] else -variable, None)
+
+
+def luby(index):
+    """
+    Returns the index-th term (from 0) of the Luby sequence 1 1 2 1 1 2 4 ...
+    used to space out restarts.
+    """
+    size = 1
+    exponent = 0
+    while size < index + 1:
+        exponent += 1
+        size = 2 * size + 1
+    while size - 1 != index:
+        size = (size - 1) // 2
+        exponent -= 1
+        index = index % size
+    return 2 ** exponent
+
+
+def satisfiable(sentence):
+    """
+    Returns a model of sentence (symbol name -> bool), or None if it has
+    none. Symbols the model leaves free are set to False.
+    """
+    cnf = CNF()
+    cnf.add(sentence)
+    assignment = Solver(cnf.clauses, cnf.count).solve()
+    if assignment is None:
+        return None
+    return {name: bool(assignment[variable]) for name, variable in cnf.variables.items()}
+
+
+def entails(knowledge, query):
+    """
+    Returns whether knowledge entails query, by checking that
+    knowledge ∧ ¬query is unsatisfiable.
+    """
+    cnf = CNF()
+    cnf.add(knowledge)
+    cnf.add(Not(query))
+    return Solver(cnf.clauses, cnf.count).solve() is None